@@ -0,0 +1,92 @@
+import threading
+import time
+
+import settings
+
+
+class _Entry:
+
+    __slots__ = ('chat_id', 'name', 'last_error', 'last_seen', 'suppressed',
+                 'digest_due')
+
+    def __init__(self, chat_id, name, now, digest_interval):
+        self.chat_id = chat_id
+        self.name = name
+        self.last_error = None
+        self.last_seen = now
+        self.suppressed = 0
+        self.digest_due = now + digest_interval
+
+
+class ErrorAggregator:
+    """Уведомления об ошибках без повторов.
+    Ошибка одного типа из одного источника сообщается в чат один раз,
+    пока она повторяется чаще, чем раз в window секунд; повторы
+    собираются в сводку раз в digest_interval секунд.
+    """
+
+    def __init__(self, window=None, digest_interval=None,
+                 clock=time.monotonic):
+        self.window = window or settings.ERROR_SUPPRESS_WINDOW
+        self.digest_interval = (digest_interval
+                                or settings.ERROR_DIGEST_INTERVAL)
+        self.clock = clock
+        self._entries = {}
+        self._next_flush = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(chat_id, error, source):
+        """Ключ ошибки: чат, источник и класс, без текста сообщения."""
+        return str(chat_id), source, type(error).__name__
+
+    def report(self, chat_id, error, source='practicum'):
+        """Текст уведомления об ошибке или None, если она подавлена."""
+        now = self.clock()
+        key = self.key(chat_id, error, source)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.last_seen < self.window:
+                entry.last_seen = now
+                entry.suppressed += 1
+                entry.last_error = str(error)
+                return None
+            entry = self._entries[key] = _Entry(
+                chat_id, key[2], now, self.digest_interval)
+            if self._next_flush is None or entry.digest_due < \
+                    self._next_flush:
+                self._next_flush = entry.digest_due
+        return f'Сбой в работе программы {error}'
+
+    def digest_text(self, entry):
+        minutes = max(1, round(self.digest_interval / 60))
+        return (f'Ошибок {entry.name} за последние {minutes} мин: '
+                f'{entry.suppressed}. Последняя: {entry.last_error}')
+
+    def flush(self):
+        """Сводки, срок которых подошёл: список (chat_id, текст).
+        Пока сводок нет, проверка не перебирает ошибки.
+        """
+        now = self.clock()
+        if self._next_flush is None or now < self._next_flush:
+            return []
+        digests = []
+        with self._lock:
+            next_flush = None
+            for key, entry in list(self._entries.items()):
+                if now >= entry.digest_due:
+                    if entry.suppressed:
+                        digests.append((entry.chat_id,
+                                        self.digest_text(entry)))
+                        entry.suppressed = 0
+                    elif now - entry.last_seen >= self.window:
+                        del self._entries[key]
+                        continue
+                    entry.digest_due = now + self.digest_interval
+                if next_flush is None or entry.digest_due < next_flush:
+                    next_flush = entry.digest_due
+            self._next_flush = next_flush
+        return digests
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,180 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import settings
+from scheduler import PollScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPollEngine:
+    """Асинхронный движок опроса.
+    Запросы к API и отправка в Telegram выполняются параллельно,
+    каждое направление ограничено своим семафором.
+    """
+
+    def __init__(self, scheduler=None, max_polls=None, max_sends=None,
+                 clock=time.monotonic):
+        if scheduler is None:
+            scheduler = PollScheduler(clock=clock)
+        self.scheduler = scheduler
+        self.clock = clock
+        self.max_polls = max_polls or settings.MAX_CONCURRENT_POLLS
+        self.max_sends = max_sends or settings.MAX_CONCURRENT_SENDS
+        self.executor = ThreadPoolExecutor(self.max_polls + self.max_sends)
+        self._poll_limit = None
+        self._send_limit = None
+        self._tasks = set()
+        # id(подписки) -> срок опроса, отложенного без учёта политики.
+        self._held = {}
+        self._wakeup = None
+        self._loop = None
+        self._stopping = False
+        # Момент вызова stop() по self.clock, для отсчёта срока остановки.
+        self.stopped_at = None
+
+    async def _call(self, limit, func, *args):
+        async with limit:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, functools.partial(func, *args))
+
+    async def fetch(self, func, *args):
+        """Запрос к API в пуле потоков с ограничением параллельности."""
+        return await self._call(self._poll_limit, func, *args)
+
+    async def send(self, func, *args):
+        """Отправка в Telegram с ограничением параллельности."""
+        return await self._call(self._send_limit, func, *args)
+
+    async def offload(self, func, *args):
+        """Блокирующий вызов (например, запись на диск) в пуле потоков."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args))
+
+    def add(self, subscription, due=None):
+        """Новая подписка опрашивается сразу или в момент due."""
+        self.scheduler.schedule(
+            subscription, self.clock() if due is None else due)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def hold(self, subscription, due=None):
+        """Пропущенный опрос не расходует интервал политики.
+        Подписка ставится на due, а при due=None снимается с очереди
+        до следующего add().
+        """
+        self._held[id(subscription)] = due
+
+    def add_threadsafe(self, subscription):
+        """Добавление подписки из другого потока."""
+        if self._loop is None:
+            self.scheduler.schedule(subscription, self.clock())
+        else:
+            self._loop.call_soon_threadsafe(self.add, subscription)
+
+    def remove(self, subscription):
+        """Снятие подписки с опроса; текущий опрос не прерывается."""
+        self.scheduler.remove(subscription)
+
+    def call_threadsafe(self, func, *args):
+        """Вызов func в потоке цикла (или сразу, если цикл не запущен)."""
+        if self._loop is None:
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def in_flight(self):
+        """Число выполняющихся опросов."""
+        return len(self._tasks)
+
+    def _start(self, poll, when, subscription):
+        metrics.LOOP_LAG.set(max(0, self.clock() - when))
+        task = asyncio.ensure_future(poll(self, subscription))
+        self._tasks.add(task)
+
+        def done(task):
+            self._tasks.discard(task)
+            # Следующий опрос планируется по итогам текущего, поэтому
+            # одна подписка никогда не опрашивается дважды одновременно.
+            if id(subscription) not in self._held:
+                self.scheduler.reschedule(subscription, when, self.clock())
+            else:
+                due = self._held.pop(id(subscription))
+                if due is None:
+                    self.scheduler.park(subscription)
+                else:
+                    self.scheduler.schedule(subscription, due)
+            self._wakeup.set()
+        task.add_done_callback(done)
+
+    async def run_once(self, poll):
+        """Запуск опросов наступивших подписок без ожидания их окончания."""
+        if self._poll_limit is None:
+            self._poll_limit = asyncio.Semaphore(self.max_polls)
+            self._send_limit = asyncio.Semaphore(self.max_sends)
+            self._wakeup = asyncio.Event()
+            self._loop = asyncio.get_running_loop()
+        self._wakeup.clear()
+        for when, subscription in self.scheduler.pop_due(self.clock()):
+            self._start(poll, when, subscription)
+        next_due = self.scheduler.next_due()
+        if next_due is None:
+            timeout = self.scheduler.interval
+        else:
+            timeout = max(0, next_due - self.clock())
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def drain(self, timeout=None):
+        """Ожидание завершения запущенных опросов не дольше timeout секунд.
+        Не успевшие опросы отменяются; возвращается их число.
+        """
+        if not self._tasks:
+            return 0
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in done:
+            if not task.cancelled():
+                task.exception()
+        for task in pending:
+            task.cancel()
+        return len(pending)
+
+    def stop(self):
+        """Остановка цикла после текущего шага."""
+        if self.stopped_at is None:
+            self.stopped_at = self.clock()
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stop_threadsafe(self):
+        """Остановка цикла из другого потока."""
+        if self._loop is None:
+            self._stopping = True
+        else:
+            self._loop.call_soon_threadsafe(self.stop)
+
+    async def run(self, poll, duration=None, drain_timeout=None):
+        """Цикл опроса до вызова stop() или истечения duration секунд.
+        poll - корутина poll(engine, subscription). После остановки
+        запущенные опросы дожидаются не дольше drain_timeout секунд.
+        """
+        if duration is not None:
+            asyncio.get_running_loop().call_later(duration, self.stop)
+        try:
+            while not self._stopping:
+                await self.run_once(poll)
+        finally:
+            cancelled = await self.drain(drain_timeout)
+            if cancelled:
+                logger.warning('Не дождались завершения опросов: %d',
+                               cancelled)
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,183 @@
+"""Нагрузочный прогон движка опроса против локальных заменителей API.
+
+Пример: python benchmark.py --subscriptions 1000 --duration 60
+Память подписок: python benchmark.py --memory 10000 100000
+"""
+import argparse
+import bisect
+import json
+import os
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import telegram
+from telegram.utils.request import Request
+
+import homework
+import http_client
+import ratelimit
+import settings
+import stand_in
+import tracing
+from media import PhotoCache
+from storage import open_store
+from subscriptions import StatusIndex, Subscription, SubscriptionRegistry
+from tracing import percentile
+
+
+def _round(value, digits=4):
+    return None if value is None else round(value, digits)
+
+
+def notification_latencies(practicum, telegram_stand_in):
+    """Задержки от смены статуса до доставки уведомления, секунды."""
+    latencies = []
+    for lesson, delivered in telegram_stand_in.deliveries:
+        changes = practicum.changed_at.get(lesson, [])
+        index = bisect.bisect_right(changes, delivered)
+        if index:
+            latencies.append(delivered - changes[index - 1])
+    return sorted(latencies)
+
+
+def configure(practicum, workdir, interval):
+    """Настройки движка для прогона: адреса заменителей, без лимитов."""
+    settings.ENDPOINT = practicum.endpoint
+    settings.RETRY_TIME = interval
+    settings.POLL_FAST_INTERVAL = interval
+    settings.POLL_MIN_INTERVAL = interval
+    settings.POLL_MAX_INTERVAL = interval * 4
+    settings.METRICS_PORT = None
+    settings.STATE_BACKEND = 'memory'
+    settings.OUTBOX_FILE = os.path.join(workdir, 'outbox.jsonl')
+    settings.OUTBOX_BACKOFF_MAX = 1
+    settings.SHUTDOWN_TIMEOUT = 2
+    settings.RELOAD_CHECK_INTERVAL = None
+    settings.TRACE_FILE = os.path.join(workdir, 'traces.jsonl')
+    ratelimit.practicum = ratelimit.TokenBucket(10 ** 6, 10 ** 6)
+    ratelimit.telegram_global = ratelimit.TokenBucket(10 ** 6, 10 ** 6)
+    ratelimit.telegram_chat = ratelimit.KeyedLimiter(10 ** 6, 10 ** 6)
+    homework.photos = PhotoCache(os.path.join(workdir, 'photos.json'))
+    http_client.install()
+
+
+def run_benchmark(subscriptions=100, duration=30, interval=5, latency=0.05,
+                  error_rate=0.0, throttle_rate=0.0, change_rate=0.05):
+    """Прогон и сводка: опросы/с, задержки уведомлений, CPU и память."""
+    behaviour = stand_in.Behaviour(latency, error_rate, throttle_rate)
+    practicum = stand_in.start(stand_in.FakePracticum(behaviour, change_rate))
+    fake_telegram = stand_in.start(stand_in.FakeTelegram(behaviour))
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            configure(practicum, workdir, interval)
+            bot = telegram.Bot(
+                token='123:benchmark', base_url=fake_telegram.base_url,
+                request=Request(con_pool_size=settings.TELEGRAM_POOL_SIZE))
+            now = int(time.time())
+            registry = SubscriptionRegistry(
+                Subscription(f'token-{index}', 1000 + index,
+                             current_date=now)
+                for index in range(subscriptions))
+            store = open_store()
+            cpu_start = time.process_time()
+            wall_start = time.perf_counter()
+            homework.run(bot, registry, store, serve_commands=False,
+                         duration=duration)
+            elapsed = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            store.close()
+    finally:
+        stand_in.stop(practicum)
+        stand_in.stop(fake_telegram)
+    latencies = notification_latencies(practicum, fake_telegram)
+    return {
+        'subscriptions': subscriptions,
+        'duration_s': round(elapsed, 2),
+        'polls': practicum.requests,
+        'polls_per_s': round(practicum.requests / elapsed, 1),
+        'notifications': len(latencies),
+        'photos': fake_telegram.photos,
+        'latency_p50_s': _round(percentile(latencies, 0.5)),
+        'latency_p99_s': _round(percentile(latencies, 0.99)),
+        'latency_mean_s': _round(statistics.mean(latencies)
+                                 if latencies else None),
+        # Задержки по трассам бота: от date_updated в ответе API
+        # и от начала опроса до доставки.
+        'trace': tracing.tracer.summary(),
+        'cpu_s': round(cpu, 2),
+        'cpu_per_poll_ms': (round(cpu * 1000 / practicum.requests, 3)
+                            if practicum.requests else None),
+        # ru_maxrss в Linux - килобайты.
+        'max_rss_mb': round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def memory_per_subscription(count, homeworks=20):
+    """Байт на подписку с заполненным индексом статусов (tracemalloc).
+    Для сравнения - тот же индекс словарём строк, как хранился раньше.
+    """
+    statuses = ('approved', 'reviewing', 'rejected')
+
+    def items(index):
+        return {str(10 ** 6 + index * homeworks + number):
+                statuses[number % len(statuses)]
+                for number in range(homeworks)}
+
+    def traced(build):
+        tracemalloc.start()
+        try:
+            objects = build()
+            size = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        del objects
+        return size
+
+    total = traced(lambda: SubscriptionRegistry(
+        Subscription(f'token-{index}', 1000 + index,
+                     homeworks=items(index))
+        for index in range(count)))
+    index_size = traced(lambda: [StatusIndex(items(index))
+                                 for index in range(count)])
+    dict_size = traced(lambda: [items(index) for index in range(count)])
+    return {
+        'subscriptions': count,
+        'homeworks_per_subscription': homeworks,
+        'bytes_per_subscription': round(total / count),
+        'index_bytes': round(index_size / count),
+        'dict_index_bytes': round(dict_size / count),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscriptions', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--interval', type=float, default=5,
+                        help='интервал опроса подписки, секунды')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--change-rate', type=float, default=0.05)
+    parser.add_argument('--memory', type=int, nargs='+', metavar='N',
+                        help='только замер памяти для N подписок')
+    parser.add_argument('--homeworks', type=int, default=20,
+                        help='работ на подписку для замера памяти')
+    args = parser.parse_args()
+    if args.memory:
+        report = [memory_per_subscription(count, args.homeworks)
+                  for count in args.memory]
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+    report = run_benchmark(
+        args.subscriptions, args.duration, args.interval, args.latency,
+        args.error_rate, args.throttle_rate, args.change_rate)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import metrics
+import settings
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    """Вызов не выполнен: сервис считается недоступным."""
+
+
+class CircuitBreaker:
+    """Размыкатель цепи для одного внешнего сервиса.
+    После failure_threshold сбоев подряд вызовы отклоняются
+    reset_timeout секунд, затем пропускаются пробные вызовы (half-open).
+    Каждая неудачная проба удваивает паузу до max_reset_timeout.
+    """
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None,
+                 max_reset_timeout=None, probes=None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = (failure_threshold
+                                  or settings.CIRCUIT_FAILURE_THRESHOLD)
+        self.reset_timeout = reset_timeout or settings.CIRCUIT_RESET_TIMEOUT
+        self.max_reset_timeout = (max_reset_timeout
+                                  or settings.CIRCUIT_MAX_RESET_TIMEOUT)
+        self.probes = probes or settings.CIRCUIT_HALF_OPEN_PROBES
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.timeout = self.reset_timeout
+        self._probing = 0
+        self._lock = threading.Lock()
+        # listener(breaker, old_state, new_state) после смены состояния.
+        self._listeners = []
+        metrics.CIRCUIT_STATE.set(STATE_VALUES[CLOSED], endpoint=name)
+
+    def subscribe(self, listener):
+        """Подписка на смену состояния."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _set_state(self, state):
+        old, self.state = self.state, state
+        metrics.CIRCUIT_STATE.set(STATE_VALUES[state], endpoint=self.name)
+        return old, state
+
+    def _notify(self, transition):
+        if transition is None or transition[0] == transition[1]:
+            return
+        for listener in list(self._listeners):
+            listener(self, *transition)
+
+    def _ready(self, now):
+        return self.opened_at is not None and \
+            now - self.opened_at >= self.timeout
+
+    def allows(self):
+        """Пропустит ли размыкатель вызов; ничего не резервирует.
+        Дешёвая проверка, чтобы не ставить заведомо лишний запрос.
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return self._ready(self.clock())
+        return self._probing < self.probes
+
+    def acquire(self):
+        """Разрешение на вызов; CircuitOpen, если сервис недоступен."""
+        transition = None
+        with self._lock:
+            if self.state == OPEN and self._ready(self.clock()):
+                transition = self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probing >= self.probes:
+                    raise CircuitOpen(f'{self.name}: идёт пробный запрос')
+                self._probing += 1
+            elif self.state == OPEN:
+                raise CircuitOpen(f'{self.name}: сервис недоступен')
+        self._notify(transition)
+
+    def success(self):
+        """Вызов завершился, сервис отвечает."""
+        transition = None
+        with self._lock:
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self._probing = max(0, self._probing - 1)
+                self.timeout = self.reset_timeout
+                self.opened_at = None
+                transition = self._set_state(CLOSED)
+        self._notify(transition)
+
+    def failure(self):
+        """Вызов не удался из-за недоступности сервиса."""
+        transition = None
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self._probing = max(0, self._probing - 1)
+                self.timeout = min(self.timeout * 2, self.max_reset_timeout)
+                self.opened_at = self.clock()
+                transition = self._set_state(OPEN)
+            elif (self.state == CLOSED
+                  and self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                transition = self._set_state(OPEN)
+        self._notify(transition)
+
+    def release(self):
+        """Пробный вызов отменён, не дойдя до сервиса."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = max(0, self._probing - 1)
+
+
+practicum = CircuitBreaker('practicum')
+telegram_api = CircuitBreaker('telegram')
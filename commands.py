@@ -0,0 +1,139 @@
+import settings
+import templates
+from lazy import lazy_import
+from subscriptions import Subscription
+
+telegram = lazy_import('telegram')
+
+HELP = (
+    '/status - последние статусы ваших работ\n'
+    '/subscribe <токен Практикума> - следить за работами\n'
+    '/pause - приостановить уведомления\n'
+    '/resume - возобновить уведомления'
+)
+
+
+class CommandService:
+    """Ответы на команды пользователей.
+    Отвечает из состояния подписок в памяти, без запросов к API.
+    """
+
+    def __init__(self, registry, on_subscribe=None, on_change=None,
+                 current=None, check_token=None):
+        self.registry = registry
+        # check_token(token): False, если API отклонил токен;
+        # исключение, если проверить не удалось.
+        self.check_token = check_token or (lambda token: True)
+        # Подписка с актуальным состоянием для /status: копии чужих
+        # подписок воркера в памяти устаревают.
+        self.current = current or (lambda subscription: subscription)
+        # Вызывается из потока Updater для новой подписки.
+        self.on_subscribe = on_subscribe or (lambda subscription: None)
+        # Вызывается со списком изменённых подписок после любого
+        # изменения набора подписок или паузы.
+        self.on_change = on_change or (lambda subscriptions: None)
+
+    def chat_subscriptions(self, chat_id):
+        """Подписки чата."""
+        return [subscription for subscription in self.registry
+                if str(subscription.chat_id) == str(chat_id)]
+
+    def status_text(self, chat_id):
+        """Текст ответа на /status."""
+        subscriptions = self.chat_subscriptions(chat_id)
+        if not subscriptions:
+            return 'Подписок нет. ' + HELP
+        lines = []
+        for subscription in subscriptions:
+            state = self.current(subscription)
+            if state.status in templates.registry:
+                verdict = templates.registry.verdict(state.status)
+            else:
+                verdict = 'Изменений статуса пока не было.'
+            line = f'Работ отслеживается: {len(state.homeworks)}. ' \
+                   f'{verdict}'
+            if subscription.paused:
+                line += ' (уведомления приостановлены)'
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def subscribe(self, chat_id, token):
+        """Добавление подписки; повторная не сбрасывает состояние."""
+        key = Subscription(token, chat_id).key
+        subscription = self.registry.get(key)
+        if subscription is not None:
+            if subscription.paused:
+                subscription.paused = False
+                self.on_change([subscription])
+            return 'Вы уже подписаны.'
+        limit = settings.MAX_CHAT_SUBSCRIPTIONS
+        if len(self.chat_subscriptions(chat_id)) >= limit:
+            return f'В чате уже {limit} подписок, больше оформить нельзя.'
+        # Каждая подписка - постоянный опрос в общем лимите Практикума,
+        # поэтому токен проверяется до её добавления.
+        try:
+            if not self.check_token(token):
+                return 'Токен отклонён API Практикума.'
+        except Exception:
+            return 'Не удалось проверить токен, попробуйте позже.'
+        subscription = self.registry.add(Subscription(token, chat_id))
+        self.on_subscribe(subscription)
+        self.on_change([subscription])
+        return 'Подписка оформлена.'
+
+    def set_paused(self, chat_id, paused):
+        """Приостановка или возобновление подписок чата."""
+        subscriptions = self.chat_subscriptions(chat_id)
+        for subscription in subscriptions:
+            subscription.paused = paused
+        if not subscriptions:
+            return 'Подписок нет. ' + HELP
+        self.on_change(subscriptions)
+        return ('Уведомления приостановлены.' if paused
+                else 'Уведомления возобновлены.')
+
+    def cmd_start(self, update, context):
+        update.effective_message.reply_text(HELP)
+
+    def cmd_status(self, update, context):
+        update.effective_message.reply_text(
+            self.status_text(update.effective_chat.id))
+
+    def cmd_subscribe(self, update, context):
+        message = update.effective_message
+        if len(context.args) != 1:
+            message.reply_text('Использование: /subscribe <токен>')
+            return
+        # Токен не должен оставаться в переписке.
+        try:
+            message.delete()
+        except telegram.error.TelegramError:
+            pass
+        chat_id = update.effective_chat.id
+        context.bot.send_message(chat_id=chat_id,
+                                 text=self.subscribe(chat_id, context.args[0]))
+
+    def cmd_pause(self, update, context):
+        update.effective_message.reply_text(
+            self.set_paused(update.effective_chat.id, True))
+
+    def cmd_resume(self, update, context):
+        update.effective_message.reply_text(
+            self.set_paused(update.effective_chat.id, False))
+
+
+def build_updater(bot, service):
+    """Updater с обработчиками команд (long polling)."""
+    # telegram.ext тянет tornado и APScheduler, поэтому импортируется
+    # только при запуске команд.
+    from telegram.ext import CommandHandler, Updater
+    updater = Updater(bot=bot, workers=settings.COMMAND_WORKERS)
+    dispatcher = updater.dispatcher
+    dispatcher.add_handler(CommandHandler(['start', 'help'],
+                                          service.cmd_start))
+    dispatcher.add_handler(CommandHandler('status', service.cmd_status))
+    dispatcher.add_handler(CommandHandler('subscribe',
+                                          service.cmd_subscribe))
+    dispatcher.add_handler(CommandHandler('pause', service.cmd_pause))
+    dispatcher.add_handler(CommandHandler('resume', service.cmd_resume))
+    return updater
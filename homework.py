@@ -1,69 +1,318 @@
+import functools
+import hashlib
+import importlib
+import re
+import signal
+import socket
 import sys
+import threading
 import time
 import logging
-from logging import StreamHandler
 import os
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 
-import requests
-
-from telegram.ext import updater
-
-import telegram
-from dotenv import load_dotenv
-
+import circuit
+import metrics
+import models
+import outbox
+import ratelimit
 import settings
+import sharding
+import templates
+import tracing
+from alerts import ErrorAggregator
+from lazy import is_loaded, lazy_import
+from log_config import Timer, setup_logging, shutdown_logging
+from media import PhotoCache
+from models import ApiResponse
+from outbox import Outbox, OutboxSender
+from ratelimit import RateLimitExceeded
+from scheduler import AdaptiveInterval, PollScheduler
+from storage import open_store
+from templates import Notification, TemplateRegistry
+from subscriptions import (Subscription, load_subscriptions,
+                           save_subscriptions)
+from watcher import FileWatcher
 
-load_dotenv()
+# Тяжёлые модули загружаются при первом обращении, а не при импорте:
+# тестам и проверкам здоровья не нужны клиенты Telegram и HTTP.
+asyncio = lazy_import('asyncio')
+requests = lazy_import('requests')
+telegram = lazy_import('telegram')
+async_engine = lazy_import('async_engine')
+commands = lazy_import('commands')
+http_client = lazy_import('http_client')
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
-
-HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE',
+                               settings.SUBSCRIPTIONS_FILE)
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-handler = StreamHandler()
-logger.addHandler(handler)
-formatter = logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
+
+photos = PhotoCache()
+errors = ErrorAggregator()
+
+# from_date для загрузки всей истории: 0 в request_statuses
+# означает «с текущего момента».
+HISTORY_START = 1
+
+# current_date в теле ответа меняется при каждом запросе,
+# поэтому при сравнении тел оно вырезается.
+CURRENT_DATE_RE = re.compile(rb'"current_date"\s*:\s*(\d+)')
+
+
+class ApiUnavailable(TypeError):
+    """API Практикума ответил ошибкой сервера (5xx)."""
+
+
+class CredentialsError(Exception):
+    """Токен отклонён API."""
+
+
+OUTAGE_MESSAGES = {
+    circuit.OPEN: 'API Практикума недоступен, опрос приостановлен '
+                  'до восстановления.',
+    circuit.CLOSED: 'API Практикума снова доступен, опрос возобновлён.',
+}
 
 
 def send_message(bot, message):
     """Отправка сообщения ботом."""
+    notify(bot, TELEGRAM_CHAT_ID, message)
+
+
+def notify(bot, chat_id, message):
+    """Отправка сообщения ботом в указанный чат.
+    Если установлена очередь outbox, сообщение только ставится в неё.
+    """
+    image = getattr(message, 'image', None)
+    for trace in getattr(message, 'traces', ()):
+        trace.mark(tracing.ENQUEUE)
+    if outbox.queue is not None:
+        outbox.queue.put(chat_id, message, image)
+        return
     try:
-        bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
-            text=message
-        )
-        img = [img for (img, verdict) in settings.HOMEWORK_STATUSES.items()
-               if verdict in message]
-        bot.send_photo(TELEGRAM_CHAT_ID, open(img[0]+'.jpg', 'rb'))
-        # if 'Ура' in message:
-        #     bot.send_photo(TELEGRAM_CHAT_ID, open(settings.IMG[0], 'rb'))
-        # elif 'проверк' in message:
-        #     bot.send_photo(TELEGRAM_CHAT_ID, open(settings.IMG[1], 'rb'))
-        # elif 'замеч' in message:
-        #     bot.send_photo(TELEGRAM_CHAT_ID, open(settings.IMG[2], 'rb'))
-    except telegram.error.TelegramError as error:
-        message = f'Ошибка отправки сообщения {error}'
-        logger.error(message)
+        deliver(bot, chat_id, message, image)
+    except (telegram.error.TelegramError, RateLimitExceeded,
+            circuit.CircuitOpen) as error:
+        logger.error('Ошибка отправки сообщения %s', error,
+                     extra={'chat_id': chat_id})
     else:
-        logger.info('Бот успешно отправил сообщение')
+        logger.info('Бот успешно отправил сообщение',
+                    extra={'chat_id': chat_id})
+
+
+def deliver(bot, chat_id, message, image=None):
+    """Отправка текста и картинки статуса; ошибки не перехватываются.
+    Если текст помещается в подпись, картинка и текст уходят одним
+    запросом: вдвое меньше вызовов Bot API и нельзя получить
+    уведомление без половины.
+    """
+    traces = getattr(message, 'traces', ())
+    as_caption = (image and settings.PHOTO_CAPTIONS
+                  and len(message) <= settings.TELEGRAM_CAPTION_MAX_LENGTH)
+    try:
+        with metrics.SEND_LATENCY.time():
+            if as_caption:
+                send_photo(bot, chat_id, image, caption=message)
+            else:
+                telegram_call(
+                    bot.send_message, chat_id,
+                    chat_id=chat_id,
+                    text=message
+                )
+                for trace in traces:
+                    trace.mark(tracing.SEND_MESSAGE)
+                if image:
+                    send_photo(bot, chat_id, image)
+            if image:
+                for trace in traces:
+                    trace.mark(tracing.SEND_PHOTO)
+    except Exception as error:
+        metrics.SEND_FAILURES.inc(type=type(error).__name__)
+        raise
+    for trace in traces:
+        tracing.tracer.finish(trace)
+
+
+def is_permanent_error(error):
+    """Ошибка Telegram, которую повторная отправка не исправит."""
+    return isinstance(error, (telegram.error.Unauthorized,
+                              telegram.error.BadRequest))
+
+
+def is_telegram_down(error):
+    """Сетевая ошибка или 5xx Bot API, а не ошибка самого запроса."""
+    return (isinstance(error, telegram.error.NetworkError)
+            and not isinstance(error, telegram.error.BadRequest))
+
+
+def telegram_call(method, limit_chat_id, *args, **kwargs):
+    """Вызов Bot API с учётом лимитов и повтором после flood control.
+    limit_chat_id - чат, по лимиту которого ждём; в метод не передаётся.
+    Пока Bot API недоступен, вызовы отклоняются без запроса (CircuitOpen).
+    """
+    attempts = settings.TELEGRAM_RETRY_AFTER_ATTEMPTS
+    for attempt in range(attempts + 1):
+        # Файл, прочитанный прошлой попыткой, отправляется с начала.
+        for arg in (*args, *kwargs.values()):
+            if hasattr(arg, 'seek'):
+                arg.seek(0)
+        ratelimit.acquire_telegram(limit_chat_id)
+        circuit.telegram_api.acquire()
+        try:
+            result = method(*args, **kwargs)
+        except telegram.error.RetryAfter as error:
+            circuit.telegram_api.success()
+            if attempt == attempts:
+                ratelimit.count('telegram_dropped')
+                raise
+            ratelimit.count('telegram_retry_after')
+            logger.warning('Flood control Telegram, повтор через %s с',
+                           error.retry_after,
+                           extra={'chat_id': limit_chat_id})
+            time.sleep(error.retry_after)
+        except Exception as error:
+            if is_telegram_down(error):
+                circuit.telegram_api.failure()
+            elif isinstance(error, telegram.error.TelegramError):
+                circuit.telegram_api.success()
+            else:
+                # Запрос не дошёл до Bot API: проба не состоялась.
+                circuit.telegram_api.release()
+            raise
+        else:
+            circuit.telegram_api.success()
+            return result
+
+
+def send_photo(bot, chat_id, name, caption=None):
+    """Отправка картинки статуса с переиспользованием file_id."""
+    photo = photos.photo(bot, name)
+    try:
+        sent = telegram_call(bot.send_photo, chat_id, chat_id, photo,
+                             caption=caption)
+    except telegram.error.BadRequest:
+        if not isinstance(photo, str):
+            raise
+        photos.forget(bot, name)
+        sent = telegram_call(bot.send_photo, chat_id, chat_id,
+                             photos.photo(bot, name), caption=caption)
+    photos.remember(bot, name, sent)
 
 
 def get_api_answer(current_timestamp):
     """Запрос к API Яндекс-Практикума."""
+    return fetch_statuses(PRACTICUM_TOKEN, current_timestamp)
+
+
+def fetch_statuses(token, current_timestamp):
+    """Запрос к API Яндекс-Практикума от имени указанного токена."""
+    response = request_statuses(token, current_timestamp)
+    check_status_code(response)
+    return response.json()
+
+
+def request_statuses(token, current_timestamp, headers=None):
+    """HTTP-запрос статусов; возвращает объект ответа."""
     timestamp = current_timestamp or int(time.time())
     params = {'from_date': timestamp}
-    response = requests.get(settings.ENDPOINT, headers=HEADERS,
-                            params=params)
+    headers = {'Authorization': f'OAuth {token}', **(headers or {})}
+    ratelimit.practicum.acquire()
+    circuit.practicum.acquire()
+    metrics.POLLS.inc()
+    try:
+        with metrics.API_LATENCY.time():
+            response = http_client.transport.get(
+                settings.ENDPOINT, headers=headers, params=params,
+                timeout=http_client.timeout())
+    except (requests.ConnectionError, requests.Timeout):
+        circuit.practicum.failure()
+        raise
+    except Exception:
+        # Ошибка самого запроса (например, токен не в latin-1)
+        # не говорит о недоступности API: проба не состоялась.
+        circuit.practicum.release()
+        raise
+    metrics.API_RESPONSES.inc(code=response.status_code)
+    if response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+        circuit.practicum.failure()
+    else:
+        circuit.practicum.success()
+    return response
+
+
+def check_status_code(response):
+    """Ошибка, если API ответил не 200."""
+    if response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+        raise ApiUnavailable('отсутствие подключения к API')
     if response.status_code != HTTPStatus.OK:
         logger.error('отсутствие подключения к API')
         raise TypeError('отсутствие подключения к API')
-    return response.json()
+
+
+def fetch_changed(subscription):
+    """Запрос статусов для подписки с условными заголовками.
+    Возвращает проверенный ApiResponse или None, если ответ
+    не изменился с прошлого опроса:
+    сервер ответил 304 или тело совпало байт в байт (без current_date).
+    В этом случае JSON не разбирается.
+    Новая подписка (без current_date) сначала загружает историю работ.
+    """
+    if not subscription.current_date and settings.SYNC_HISTORY:
+        sync_subscription(subscription)
+        return None
+    etag, modified, digest = subscription.validators or (None, None, None)
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if modified:
+        headers['If-Modified-Since'] = modified
+    response = request_statuses(subscription.token,
+                                subscription.current_date, headers)
+    if response.status_code == HTTPStatus.NOT_MODIFIED:
+        metrics.SKIPPED_PARSES.inc(reason='not_modified')
+        return None
+    check_status_code(response)
+    body = response.content
+    current_date = CURRENT_DATE_RE.search(body)
+    new_digest = hashlib.blake2b(CURRENT_DATE_RE.sub(b'', body),
+                                 digest_size=16).digest()
+    validators = (response.headers.get('ETag'),
+                  response.headers.get('Last-Modified'), new_digest)
+    if new_digest != digest:
+        # Валидаторы сохранит handle_response: если разбор упадёт,
+        # тот же ответ не должен считаться уже обработанным.
+        parsed = ApiResponse.from_bytes(body)
+        parsed.validators = validators
+        return parsed
+    subscription.validators = validators
+    metrics.SKIPPED_PARSES.inc(reason='same_body')
+    if current_date:
+        subscription.current_date = int(current_date.group(1))
+    return None
+
+
+def sync_subscription(subscription):
+    """Загрузка всех работ токена в индекс статусов без уведомлений.
+    Курсором дальнейших опросов служит current_date из ответа.
+    """
+    response = request_statuses(subscription.token, HISTORY_START)
+    check_status_code(response)
+    data = models.decode(response.content)
+    homeworks = list(models.iter_homeworks(data))
+    index = {homework.key: homework.status for homework in homeworks}
+    # Индекс меняется только после разбора всего ответа.
+    subscription.homeworks.update(index)
+    if homeworks:
+        subscription.status = models.latest(homeworks).status
+    subscription.current_date = data.get('current_date') or int(time.time())
+    logger.info('Загружена история работ: %d', len(index),
+                extra={'chat_id': subscription.chat_id})
+    return len(index)
 
 
 def check_response(response):
@@ -83,7 +332,9 @@ def check_response(response):
 
 
 def parse_status(homework_list):
-    """Извлечение статуса о домашней работе."""
+    """Извлечение статуса о домашней работе.
+    Возвращает Notification - строку с кодом статуса и картинкой.
+    """
     homework_status = homework_list.get('status')
     if homework_status is None:
         logger.error('нет ключа \'status\'')
@@ -92,13 +343,10 @@ def parse_status(homework_list):
     if homework_name is None:
         logger.error('нет ключа \'homework_name\'')
         raise KeyError('нет ключа \'homework_name\'')
-    if homework_status not in settings.HOMEWORK_STATUSES.keys():
+    if homework_status not in templates.registry:
         logger.error('недокументированный статус домашней работы')
         raise KeyError('недокументированный статус домашней работы')
-    verdict = settings.HOMEWORK_STATUSES[homework_status]
-    message = f'Изменился статус проверки работы "{homework_name}". ' \
-              f'{verdict}'
-    return message
+    return templates.registry.render(homework_status, homework_name)
 
 
 def check_tokens():
@@ -106,43 +354,591 @@ def check_tokens():
     return all([PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID])
 
 
+def render_homework(homework):
+    """Уведомление о смене статуса работы из ответа API."""
+    if homework.status not in templates.registry:
+        logger.error('недокументированный статус домашней работы')
+        raise KeyError('недокументированный статус домашней работы')
+    notification = templates.registry.render(homework.status,
+                                             homework.lesson_name)
+    notification.updated_at = homework.date_updated
+    return notification
+
+
+def collect_changes(subscription, homeworks):
+    """Сравнение всего списка работ с картой состояний подписки.
+    Возвращает сообщения обо всех сменах статуса; о работе с
+    недокументированным статусом сообщается отдельно, а изменения
+    остальных работ всё равно записываются и отправляются.
+    """
+    changed = []
+    messages = []
+    failures = []
+    for homework in homeworks:
+        if subscription.homeworks.get(homework.key) == homework.status:
+            continue
+        try:
+            messages.append(render_homework(homework))
+        except KeyError as error:
+            failure = handle_error(subscription, error)
+            if failure:
+                failures.append(failure)
+            continue
+        changed.append(homework)
+    subscription.homeworks.update(
+        (homework.key, homework.status) for homework in changed)
+    if changed:
+        subscription.status = models.latest(changed).status
+        subscription.idle_polls = 0
+    else:
+        subscription.idle_polls += 1
+    # Сообщения об ошибках - в конце, картинка берётся от первой смены.
+    return messages + failures
+
+
+def handle_response(subscription, response):
+    """Разбор ответа API (ApiResponse) для подписки.
+    Возвращает текст уведомления или None, если статус не изменился.
+    response=None означает, что ответ совпал с предыдущим.
+    """
+    if response is None:
+        subscription.idle_polls += 1
+        logger.debug('Статус работ не изменился',
+                     extra={'chat_id': subscription.chat_id})
+        return None
+    message = None
+    changes = collect_changes(subscription, response.homeworks)
+    if changes:
+        # Несколько изменений за один опрос уходят одним сообщением.
+        message = Notification.join(changes)
+        logger.info('Отправка сообщения: %s', message,
+                    extra={'chat_id': subscription.chat_id})
+    else:
+        logger.debug('Статус работ не изменился',
+                     extra={'chat_id': subscription.chat_id})
+    if response.current_date:
+        subscription.current_date = response.current_date
+    if response.validators is not None:
+        subscription.validators = response.validators
+    return message
+
+
+def attach_trace(message, trace):
+    """Трасса для уведомления о смене статуса; о сбоях не трассируется.
+    Началом отсчёта служит время смены статуса по данным API.
+    """
+    if isinstance(message, Notification):
+        trace.origin = tracing.parse_time(message.updated_at)
+        message.trace = trace
+    return message
+
+
+def is_outage_error(error):
+    """Ошибка недоступности API.
+    О ней сообщается одним уведомлением при размыкании цепи,
+    а не в каждую подписку.
+    """
+    if isinstance(error, (ApiUnavailable, circuit.CircuitOpen)):
+        return True
+    # requests ещё не загружен - значит, и его ошибок быть не могло.
+    return is_loaded('requests') and \
+        isinstance(error, requests.RequestException)
+
+
+def handle_error(subscription, error):
+    """Текст уведомления о сбое или None, если о нём уже сообщали.
+    Повторы ошибки того же типа попадают в периодическую сводку.
+    """
+    metrics.ERRORS.inc(type=type(error).__name__)
+    if is_outage_error(error):
+        logger.debug('API недоступен: %s', error,
+                     extra={'chat_id': subscription.chat_id})
+        return None
+    message = errors.report(subscription.chat_id, error)
+    if message is None:
+        logger.debug('Повтор ошибки %s', error,
+                     extra={'chat_id': subscription.chat_id})
+        return None
+    logger.error(message, exc_info=error,
+                 extra={'chat_id': subscription.chat_id})
+    subscription.err_message = message
+    return message
+
+
+async def poll_subscription_async(bot, store, engine, subscription,
+                                  shard=None):
+    """Асинхронный цикл опроса API для одной подписки.
+    shard - доля подписок воркера; чужие подписки пропускаются.
+    """
+    # При разомкнутой цепи опрос пропускается без перехода в поток.
+    if subscription.paused or not circuit.practicum.allows():
+        return
+    if shard is not None and not shard.claim(subscription, store):
+        # Пропуск не расходует интервал политики: своя подписка ждёт
+        # конца передачи, чужая ждёт смены состава (sync_shard).
+        engine.hold(subscription, shard.ready_at()
+                    if shard.owns(subscription) else None)
+        return
+    timer = Timer()
+    trace = tracing.tracer.start(subscription.chat_id)
+    subscription.polled_at = trace.started
+    try:
+        response = await engine.fetch(fetch_changed, subscription)
+        trace.mark(tracing.HTTP_DONE)
+        message = handle_response(subscription, response)
+        trace.mark(tracing.PARSE_DONE)
+    except Exception as error:
+        message = handle_error(subscription, error)
+    if message:
+        await engine.send(notify, bot, subscription.chat_id,
+                          attach_trace(message, trace))
+    for chat_id, digest in errors.flush():
+        await engine.send(notify, bot, chat_id, digest)
+    # Состояние снимается в цикле событий, а пачка пишется в потоке:
+    # запись в SQLite не должна останавливать остальные опросы.
+    if store.mark(subscription):
+        try:
+            await engine.offload(store.flush)
+        except Exception as error:
+            logger.error('Не удалось сохранить состояние подписок: %s',
+                         error, extra={'chat_id': subscription.chat_id})
+    logger.debug('Опрос завершён', extra={
+        'chat_id': subscription.chat_id, 'duration': timer.elapsed})
+
+
+def report_outage(bot, chat_id, breaker, old, new):
+    """Одно уведомление о недоступности API и одно о восстановлении.
+    Неудачные пробные запросы (half-open -> open) не сообщаются.
+    """
+    if new == circuit.OPEN and old == circuit.CLOSED:
+        logger.error('API %s недоступен, запросы приостановлены на %s с',
+                     breaker.name, breaker.timeout)
+    elif new == circuit.CLOSED:
+        logger.info('API %s снова доступен', breaker.name)
+    else:
+        return
+    if bot is not None and chat_id:
+        notify(bot, chat_id, OUTAGE_MESSAGES[new])
+
+
+def reload_settings():
+    """Повторное чтение settings и зависящих от них шаблонов."""
+    importlib.reload(settings)
+    templates.registry = TemplateRegistry.from_settings()
+
+
+def load_env():
+    """Чтение .env при запуске, а не при импорте модуля."""
+    global PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
+    global SUBSCRIPTIONS_FILE
+    from dotenv import load_dotenv
+    if load_dotenv():
+        # Настройки из окружения (LOG_LEVEL, LOCALE, WORKERS...)
+        # могли прийти из .env.
+        reload_settings()
+    PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
+    TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+    TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+    SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE',
+                                   settings.SUBSCRIPTIONS_FILE)
+
+
+def make_bot(token, pool_size=None):
+    """Клиент Bot API (адрес можно заменить через TELEGRAM_BASE_URL)."""
+    from telegram.utils.request import Request
+    return telegram.Bot(
+        token=token, base_url=settings.TELEGRAM_BASE_URL,
+        request=Request(con_pool_size=pool_size
+                        or settings.TELEGRAM_POOL_SIZE))
+
+
+def check_practicum_token(token, timeout):
+    """Запрос к API Практикума; CredentialsError, если токен отклонён."""
+    response = http_client.transport.get(
+        settings.ENDPOINT, headers={'Authorization': f'OAuth {token}'},
+        params={'from_date': int(time.time())}, timeout=timeout)
+    if response.status_code in (HTTPStatus.UNAUTHORIZED,
+                                HTTPStatus.FORBIDDEN):
+        raise CredentialsError('токен Практикума отклонён')
+    check_status_code(response)
+
+
+def validate_token(token):
+    """Проверка токена из /subscribe одним запросом в общем лимите.
+    False, если токен отклонён; сбои сети и API не перехватываются.
+    """
+    if not token.isascii() or not token.isprintable():
+        return False
+    ratelimit.practicum.acquire(settings.RATE_LIMIT_MAX_WAIT)
+    try:
+        check_practicum_token(token, http_client.timeout())
+    except CredentialsError:
+        return False
+    return True
+
+
+def check_telegram_token(token, timeout):
+    """Запрос getMe к Bot API; CredentialsError, если токен отклонён."""
+    try:
+        make_bot(token, pool_size=1).get_me(timeout=timeout)
+    except (telegram.error.InvalidToken,
+            telegram.error.Unauthorized) as error:
+        raise CredentialsError(f'токен Telegram отклонён: {error}')
+
+
+def preflight(timeout=None):
+    """Параллельная проверка токенов Практикума и Telegram при запуске.
+    Возвращает список отклонённых токенов; если API просто
+    недоступен, это только записывается в лог.
+    """
+    timeout = timeout or settings.PREFLIGHT_TIMEOUT
+    checks = {
+        'practicum': functools.partial(check_practicum_token,
+                                       PRACTICUM_TOKEN, timeout),
+        'telegram': functools.partial(check_telegram_token,
+                                      TELEGRAM_TOKEN, timeout),
+    }
+    problems = []
+    with ThreadPoolExecutor(len(checks)) as executor:
+        futures = {name: executor.submit(check)
+                   for name, check in checks.items()}
+        for name, future in futures.items():
+            try:
+                future.result()
+            except CredentialsError as error:
+                problems.append(str(error))
+            except Exception as error:
+                logger.warning('Не удалось проверить токен %s: %s',
+                               name, error)
+    return problems
+
+
+def restore_state(store, subscriptions):
+    """Состояние подписок из хранилища.
+    Продолжаем с сохранённого current_date. Без сохранённого состояния
+    при SYNC_HISTORY current_date остаётся 0, чтобы первый опрос
+    загрузил историю работ; иначе опрос начинается с «сейчас».
+    """
+    current_timestamp = int(time.time())
+    for subscription in subscriptions:
+        if not store.load(subscription) and not settings.SYNC_HISTORY:
+            subscription.current_date = current_timestamp
+
+
+def reload_config(engine, registry, store):
+    """Перечитывание settings, шаблонов и списка подписок без перезапуска.
+    Вызывается в потоке цикла опроса. Состояние оставшихся подписок
+    сохраняется, новые продолжают с сохранённого current_date.
+    """
+    try:
+        reload_settings()
+        photos.preload(templates.registry.images())
+        fresh = load_subscriptions(SUBSCRIPTIONS_FILE, PRACTICUM_TOKEN,
+                                   TELEGRAM_CHAT_ID)
+    except Exception:
+        logger.exception('Не удалось перечитать настройки')
+        return
+    scheduler = engine.scheduler
+    scheduler.interval = settings.RETRY_TIME
+    if scheduler.policy is not None:
+        scheduler.policy = AdaptiveInterval()
+    removed = [subscription for subscription in registry
+               if fresh.get(subscription.key) is None]
+    for subscription in removed:
+        registry.remove(subscription.key)
+        engine.remove(subscription)
+    added = [subscription for subscription in fresh
+             if registry.get(subscription.key) is None]
+    restore_state(store, added)
+    for subscription in added:
+        registry.add(subscription)
+        engine.add(subscription)
+    logger.info('Настройки перечитаны, подписок: %d (+%d, -%d)',
+                len(registry), len(added), len(removed))
+
+
+async def serve(engine, poll, duration=None, on_reload=None):
+    """Цикл опроса с обработкой сигналов.
+    SIGTERM и SIGINT - плавная остановка, SIGHUP - on_reload().
+    """
+    loop = asyncio.get_running_loop()
+    handlers = {signal.SIGTERM: engine.stop, signal.SIGINT: engine.stop}
+    if on_reload is not None and hasattr(signal, 'SIGHUP'):
+        handlers[signal.SIGHUP] = on_reload
+    for signum, handler in handlers.items():
+        try:
+            loop.add_signal_handler(signum, handler)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Windows или цикл не в главном потоке.
+            pass
+    await engine.run(poll, duration, settings.SHUTDOWN_TIMEOUT)
+
+
+def save_registry(registry, store, changed=(), shard=None):
+    """Сохранение списка подписок и изменений из команд бота.
+    Изменения публикуются в хранилище для воркера-владельца;
+    состояние пишется только для своих подписок: копии чужих
+    в памяти устарели и затёрли бы состояние владельца.
+    """
+    save_subscriptions(SUBSCRIPTIONS_FILE, registry)
+    for subscription in changed:
+        store.publish(subscription)
+        if shard is None or shard.owns(subscription):
+            store.save(subscription)
+
+
+def current_state(store, shard, subscription):
+    """Подписка с актуальным состоянием для ответа на команду.
+    Чужие подписки воркера читаются из общего хранилища.
+    """
+    if shard is None or shard.owns(subscription):
+        return subscription
+    return store.peek(subscription) or subscription
+
+
+def apply_subscription_changes(engine, registry, store, changes):
+    """Новые подписки и пауза из команд, принятых другим воркером.
+    Вызывается в потоке цикла опроса.
+    """
+    for token, chat_id, paused in changes:
+        subscription = registry.get(Subscription(token, chat_id).key)
+        if subscription is None:
+            subscription = registry.add(Subscription(token, chat_id))
+            store.load(subscription)
+            engine.add(subscription)
+        subscription.paused = paused
+
+
+def requeue_handoffs(engine, registry, subscriptions, due):
+    """Постановка перешедших к воркеру подписок в очередь на due."""
+    for subscription in subscriptions:
+        # Подписка могла быть удалена, пока ждала смены состава.
+        if registry.get(subscription.key) is subscription:
+            engine.add(subscription, due)
+
+
+def sync_shard(engine, registry, store, shard):
+    """Сброс состояния и приём изменений команд по сердцебиению.
+    Новый владелец подписки видит сброшенное состояние в общем хранилище.
+    """
+    store.flush()
+    handoffs = shard.handoffs()
+    if handoffs:
+        engine.call_threadsafe(requeue_handoffs, engine, registry, handoffs,
+                               shard.ready_at())
+    changes = store.subscription_changes()
+    if changes:
+        engine.call_threadsafe(apply_subscription_changes, engine, registry,
+                               store, changes)
+
+
+def register_queue_metrics(engine):
+    """Метрики глубины очередей и пула соединений."""
+    gauge = metrics.REGISTRY.gauge
+    gauge('homework_scheduled_subscriptions',
+          'Подписок в очереди планировщика.',
+          func=lambda: len(engine.scheduler))
+    gauge('homework_polls_in_flight', 'Выполняющихся опросов.',
+          func=engine.in_flight)
+    gauge('homework_outbox_depth', 'Сообщений в очереди на отправку.',
+          func=lambda: len(outbox.queue))
+    gauge('homework_http_connections_reused',
+          'Запросов по уже открытым соединениям.',
+          func=lambda: http_client.connection_stats()['reused'])
+    gauge('homework_rate_limited_total',
+          'Вызовов, ожидавших места в лимите.',
+          func=lambda: sum(
+              limiter['throttled'] for limiter
+              in (ratelimit.practicum.stats, ratelimit.telegram_global.stats)))
+
+
 def main():
     """Основная логика работы бота."""
+    load_env()
+    setup_logging()
     if not check_tokens():
         logger.critical(
             'отсутствие одной или нескольких обязательных переменных окружения'
             'во время запуска бота ')
+        shutdown_logging()
         sys.exit('Программа остановлена')
+    problems = preflight() if settings.PREFLIGHT_TIMEOUT else []
+    if problems:
+        logger.critical('Проверка токенов не пройдена: %s',
+                        '; '.join(problems))
+        shutdown_logging()
+        sys.exit('Программа остановлена')
+    if settings.SHARD_WORKERS > 1 and settings.STATE_BACKEND != 'sqlite':
+        logger.critical('Для нескольких воркеров нужно общее хранилище '
+                        'состояния (STATE_BACKEND = \'sqlite\')')
+        shutdown_logging()
+        sys.exit('Программа остановлена')
+    try:
+        if settings.SHARD_WORKERS > 1:
+            sharding.supervise(run_worker, settings.SHARD_WORKERS)
+        else:
+            serve_worker()
+    finally:
+        shutdown_logging()
 
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
-    status = ''
-    err_message = ''
 
-    while True:
+def serve_worker(worker=0, shard=None):
+    """Подготовка бота, подписок и хранилища и запуск опроса."""
+    bot = make_bot(TELEGRAM_TOKEN)
+    http_client.install()
+    photos.preload(templates.registry.images())
+    registry = load_subscriptions(SUBSCRIPTIONS_FILE, PRACTICUM_TOKEN,
+                                  TELEGRAM_CHAT_ID)
+    store = open_store()
+    restore_state(store, registry)
+    logger.info('Загружено подписок: %d', len(registry))
+    try:
+        run(bot, registry, store, serve_commands=worker == 0, shard=shard,
+            worker=worker)
+    finally:
+        if shard is not None:
+            shard.stop()
+        store.close()
+
+
+def run_worker(index):
+    """Процесс-воркер: опрашивает свою долю подписок.
+    Команды бота обслуживает только воркер 0.
+    """
+    load_env()
+    setup_logging()
+    # Общие лимиты API делятся между воркерами поровну.
+    ratelimit.configure(settings.SHARD_WORKERS)
+    worker_id = f'{socket.gethostname()}-{os.getpid()}'
+    try:
+        serve_worker(index, sharding.Shard(
+            worker_id, sharding.Membership(worker_id)))
+    finally:
+        shutdown_logging()
+
+
+def worker_path(path, worker):
+    """Отдельный файл воркера; у воркера 0 - исходный."""
+    return path if not worker else f'{path}.{worker}'
+
+
+def ignore_stop_signals():
+    """Игнорирование SIGTERM и SIGINT до конца процесса.
+    После выхода из asyncio.run для них снова действуют обработчики
+    по умолчанию, которые оборвали бы сохранение и досылку очереди.
+    """
+    for signum in (signal.SIGTERM, signal.SIGINT):
         try:
-            response = get_api_answer(current_timestamp)
-            homeworks_ok = check_response(response)
-            if homeworks_ok:
-                new_status = parse_status(homeworks_ok[0])
-                if new_status != status:
-                    send_message(bot, new_status)
-                    status = new_status
-                logger.info(f'Отправка сообщения: {new_status}')
-            else:
-                logger.debug('Статус работ не изменился')
-            current_timestamp = response.get('current_date', current_timestamp)
+            signal.signal(signum, signal.SIG_IGN)
+        except ValueError:
+            # Не главный поток: сигналы сюда не доставляются.
+            pass
 
+
+def stop_within(stop, timeout):
+    """Вызов stop в отдельном потоке с ожиданием не дольше timeout.
+    Возвращает True, если остановка успела завершиться.
+    """
+    thread = threading.Thread(target=stop, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def run(bot, registry, store, serve_commands=True, duration=None,
+        shard=None, worker=0):
+    """Опрос подписок, очередь отправки и команды бота до остановки."""
+    sender = OutboxSender(
+        outbox.install(Outbox(
+            worker_path(settings.OUTBOX_FILE, worker),
+            coalesce_window=settings.OUTBOX_COALESCE_WINDOW)),
+        functools.partial(deliver, bot),
+        is_permanent=is_permanent_error,
+        coalesce=Notification.join,
+    )
+    sender.start()
+    tracing.install(tracing.Tracer(
+        worker_path(settings.TRACE_FILE, worker) if settings.TRACE_FILE
+        else None))
+    engine = async_engine.AsyncPollEngine(
+        PollScheduler(policy=AdaptiveInterval()))
+    engine.scheduler.restore(registry)
+    reload = functools.partial(reload_config, engine, registry, store)
+    if settings.METRICS_PORT is not None:
+        register_queue_metrics(engine)
+        metrics.serve(settings.METRICS_PORT + worker)
+    outage_listeners = {
+        # О сбое сообщает один воркер, а не каждый.
+        circuit.practicum: functools.partial(
+            report_outage, None if worker else bot, TELEGRAM_CHAT_ID),
+        # О недоступности Telegram сообщить через Telegram нельзя.
+        circuit.telegram_api: functools.partial(report_outage, None, None),
+    }
+    for breaker, listener in outage_listeners.items():
+        breaker.subscribe(listener)
+    if shard is not None:
+        shard.start(on_tick=functools.partial(sync_shard, engine, registry,
+                                              store, shard))
+    updater = None
+    if serve_commands:
+        service = commands.CommandService(
+            registry,
+            on_subscribe=engine.add_threadsafe,
+            on_change=functools.partial(save_registry, registry, store,
+                                        shard=shard),
+            current=functools.partial(current_state, store, shard),
+            check_token=validate_token,
+        )
+        updater = commands.build_updater(bot, service)
+        updater.start_polling(drop_pending_updates=True)
+    watcher = None
+    if settings.RELOAD_CHECK_INTERVAL:
+        watcher = FileWatcher(
+            [settings.__file__, SUBSCRIPTIONS_FILE,
+             settings.STATUS_TEMPLATES_FILE],
+            functools.partial(engine.call_threadsafe, reload))
+        watcher.start()
+    try:
+        asyncio.run(serve(
+            engine, functools.partial(poll_subscription_async, bot, store,
+                                      shard=shard),
+            duration, reload))
+    finally:
+        if shard is not None:
+            # Воркер получает SIGTERM и от платформы, и от supervise();
+            # повторный сигнал не должен прервать завершение.
+            ignore_stop_signals()
+        # Всё завершение укладывается в срок остановки. Состояние
+        # подписок сохраняется первым, пока время ещё есть.
+        deadline = (engine.stopped_at or engine.clock()) + \
+            settings.SHUTDOWN_TIMEOUT
+
+        def remaining():
+            return max(0, deadline - engine.clock())
+
+        try:
+            store.flush()
         except Exception as error:
-            new_err_message = f'Сбой в работе программы {error}'
-            if new_err_message != err_message:
-                logger.error(new_err_message, exc_info=True)
-                send_message(bot, new_err_message)
-                err_message = new_err_message
-        finally:
-            time.sleep(settings.RETRY_TIME)
-    updater.start_polling()
-    updater.idle()
+            logger.error('Не удалось сохранить состояние подписок: %s',
+                         error)
+        if watcher is not None:
+            watcher.stop(timeout=remaining())
+        for breaker, listener in outage_listeners.items():
+            breaker.unsubscribe(listener)
+        if updater is not None and \
+                not stop_within(updater.stop, remaining()):
+            logger.warning('Приём команд не остановился за срок остановки')
+        # Очередь досылается в оставшееся время,
+        # остаток сохранится в журнале до следующего запуска.
+        if not sender.drain(remaining()):
+            logger.warning('Не отправлено сообщений до остановки: %d',
+                           len(outbox.queue))
+        sender.stop(timeout=min(settings.OUTBOX_STOP_TIMEOUT, remaining()))
+        outbox.queue.close()
+        outbox.install(None)
+        logger.info('Задержка уведомлений: %s',
+                    tracing.summary_text(tracing.tracer.summary()))
+    return engine
 
 
 if __name__ == '__main__':
@@ -0,0 +1,105 @@
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, PoolManager
+from urllib3.util.retry import Retry
+
+import settings
+
+# Пока пул не установлен, запросы идут через модуль requests
+# (новое соединение на каждый запрос).
+transport = requests
+
+_lock = threading.Lock()
+STATS = {'requests': 0, 'connections': 0}
+
+
+def _count(key):
+    with _lock:
+        STATS[key] += 1
+
+
+def connection_stats():
+    """Число запросов, установленных соединений и повторных использований."""
+    with _lock:
+        stats = dict(STATS)
+    stats['reused'] = stats['requests'] - stats['connections']
+    return stats
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+
+    def _new_conn(self):
+        _count('connections')
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+
+    def _new_conn(self):
+        _count('connections')
+        return super()._new_conn()
+
+
+class JitterRetry(Retry):
+    """Экспоненциальная задержка между попытками со случайной добавкой."""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return backoff
+        return backoff + random.uniform(0, settings.HTTP_BACKOFF_JITTER)
+
+
+class PooledAdapter(HTTPAdapter):
+    """Адаптер с подсчётом новых соединений и запросов."""
+
+    def init_poolmanager(self, connections, maxsize, block=False,
+                         **pool_kwargs):
+        self.poolmanager = PoolManager(
+            num_pools=connections, maxsize=maxsize, block=block,
+            **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        _count('requests')
+        return super().send(request, **kwargs)
+
+
+def build_session():
+    """Сессия с пулом keep-alive соединений и повторами при 5xx/429.
+    Заголовок Retry-After учитывается.
+    """
+    retry = JitterRetry(
+        total=settings.HTTP_RETRIES,
+        backoff_factor=settings.HTTP_BACKOFF_FACTOR,
+        status_forcelist=settings.HTTP_RETRY_STATUSES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = PooledAdapter(
+        pool_connections=settings.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def install(session=None):
+    """Установка общей сессии для всех запросов к API."""
+    global transport
+    transport = session or build_session()
+    return transport
+
+
+def timeout():
+    """Таймауты соединения и чтения."""
+    return settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT
@@ -0,0 +1,62 @@
+"""Отчёт о времени импорта модуля бота (по данным python -X importtime).
+
+Пример: python import_report.py --top 15
+Код возврата 1, если импорт дольше settings.IMPORT_TIME_BUDGET.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import settings
+
+
+def measure(module='homework'):
+    """Список (собственное, общее время в мкс, глубина, модуль)."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, total, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(own), int(total), depth, name.strip()))
+    return rows
+
+
+def report(rows, module='homework', top=15):
+    """Текст отчёта и общее время импорта модуля в секундах."""
+    # Вложенные импорты идут подряд перед строкой самого модуля;
+    # модули, загруженные при старте интерпретатора (site), не считаются.
+    end = max(index for index, row in enumerate(rows)
+              if row[2] == 0 and row[3] == module)
+    start = end
+    while start and rows[start - 1][2] > 0:
+        start -= 1
+    total = rows[end][1]
+    own = sorted(rows[start:end + 1], key=lambda row: row[0], reverse=True)
+    lines = [f'{"собств., мс":>12} {"всего, мс":>10}  модуль']
+    for self_us, total_us, _, name in own[:top]:
+        lines.append(f'{self_us / 1000:12.1f} {total_us / 1000:10.1f}  '
+                     f'{name}')
+    lines.append(f'Импорт {module}: {total / 1000:.1f} мс '
+                 f'(бюджет {settings.IMPORT_TIME_BUDGET * 1000:.0f} мс)')
+    return '\n'.join(lines), total / 10 ** 6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='homework')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+    text, seconds = report(measure(args.module), args.module, args.top)
+    print(text)
+    if seconds > settings.IMPORT_TIME_BUDGET:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
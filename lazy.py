@@ -0,0 +1,25 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """Модуль, который загружается при первом обращении к атрибуту.
+    Уже загруженный модуль возвращается как есть.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def is_loaded(name):
+    """Загружен ли модуль на самом деле, а не только объявлен лениво."""
+    module = sys.modules.get(name)
+    return module is not None and \
+        not isinstance(module, importlib.util._LazyModule)
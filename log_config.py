@@ -0,0 +1,119 @@
+import json
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+import settings
+
+# Поля записи, которые можно передать через extra=.
+EXTRA_FIELDS = ('chat_id', 'duration', 'homework', 'status', 'endpoint')
+
+_listener = None
+_queue_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON."""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc_info'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает одну из every одинаковых DEBUG-записей.
+    Одинаковыми считаются записи с одним шаблоном сообщения;
+    к пропущенной записи добавляется число отброшенных.
+    """
+
+    def __init__(self, every=None):
+        super().__init__()
+        self.every = every or settings.LOG_SAMPLE_EVERY
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+        if seen % self.every:
+            return False
+        if seen:
+            record.msg = f'{record.msg} (ещё {self.every - 1} похожих)'
+        return True
+
+
+class _EnqueueHandler(QueueHandler):
+    """QueueHandler без форматирования в вызывающем потоке.
+    Аргументы сообщения подставляются уже в фоновом потоке.
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            # traceback нельзя передать в другой поток отложенно.
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level=None, fmt=None, stream=None):
+    """Настройка логирования через очередь и фоновый поток вывода."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+    fmt = fmt or settings.LOG_FORMAT
+    handler = logging.StreamHandler(stream)
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    log_queue = queue.SimpleQueue()
+    _queue_handler = _EnqueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    root.setLevel(level or settings.LOG_LEVEL)
+    root.addHandler(_queue_handler)
+    _listener = QueueListener(log_queue, handler,
+                              respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Вывод оставшихся записей и остановка фонового потока."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        _listener = _queue_handler = None
+
+
+class Timer:
+    """Замер длительности для поля duration в логах."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return round(time.perf_counter() - self.start, 4)
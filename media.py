@@ -0,0 +1,96 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PhotoCache:
+    """Кэш картинок статусов.
+    Байты картинки читаются с диска один раз; после первой загрузки
+    в Telegram сохраняется file_id и дальше отправляется только он.
+    file_id привязан к боту, поэтому хранится отдельно для каждого токена.
+    """
+
+    def __init__(self, path=None, image_dir=None):
+        self.path = path or settings.PHOTO_CACHE_FILE
+        self.image_dir = image_dir or settings.IMAGE_DIR
+        self._lock = threading.Lock()
+        self._images = {}
+        self._file_ids = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        """Запись кэша; ошибка только записывается в лог.
+        Картинка к этому моменту уже отправлена, и исключение привело бы
+        к повторной доставке уведомления из очереди.
+        """
+        # Свой временный файл у каждого процесса-воркера.
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(self._file_ids, file)
+            os.replace(tmp_path, self.path)
+        except OSError as error:
+            logger.error('Не удалось сохранить кэш картинок: %s', error)
+
+    @staticmethod
+    def _bot_key(bot):
+        token = getattr(bot, 'token', '') or ''
+        return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+    def image_bytes(self, name):
+        """Байты картинки, прочитанные с диска один раз."""
+        data = self._images.get(name)
+        if data is None:
+            with open(os.path.join(self.image_dir, name + '.jpg'),
+                      'rb') as file:
+                data = self._images[name] = file.read()
+        return data
+
+    def preload(self, names):
+        """Чтение всех картинок при старте."""
+        for name in names:
+            if os.path.exists(os.path.join(self.image_dir, name + '.jpg')):
+                self.image_bytes(name)
+
+    def photo(self, bot, name):
+        """file_id, если картинка уже загружалась этим ботом, иначе файл."""
+        file_id = self._file_ids.get(self._bot_key(bot), {}).get(name)
+        if file_id:
+            return file_id
+        photo = io.BytesIO(self.image_bytes(name))
+        photo.name = name + '.jpg'
+        return photo
+
+    def remember(self, bot, name, message):
+        """Сохранение file_id из ответа send_photo."""
+        sizes = getattr(message, 'photo', None)
+        if not sizes:
+            return
+        file_id = sizes[-1].file_id
+        with self._lock:
+            files = self._file_ids.setdefault(self._bot_key(bot), {})
+            if files.get(name) == file_id:
+                return
+            files[name] = file_id
+            self._save()
+
+    def forget(self, bot, name):
+        """Сброс file_id, отвергнутого Telegram."""
+        with self._lock:
+            if self._file_ids.get(self._bot_key(bot), {}).pop(name, None):
+                self._save()
@@ -0,0 +1,239 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"'))
+        for name, value in pairs)
+    return '{' + body + '}'
+
+
+class Metric:
+    """Базовая метрика с необязательными метками."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def samples(self):
+        """Пары (суффикс и метки, значение) для вывода."""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        for suffix, value in self.samples():
+            lines.append(f'{self.name}{suffix} {value}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield _format_labels(self.labels, key), value
+
+
+class Gauge(Metric):
+    """Текущее значение; может вычисляться функцией при выводе."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), func=None):
+        super().__init__(name, documentation, labels)
+        self.func = func
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        if self.func is not None:
+            yield '', self.func()
+            return
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield _format_labels(self.labels, key), value
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Замер длительности блока кода."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2]))
+                           for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield '_bucket' + _format_labels(
+                    self.labels, key, [('le', bound)]), cumulative
+            yield '_bucket' + _format_labels(
+                self.labels, key, [('le', '+Inf')]), count
+            yield '_sum' + _format_labels(self.labels, key), total
+            yield '_count' + _format_labels(self.labels, key), count
+
+
+class Registry:
+    """Набор метрик процесса."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=(), func=None):
+        return self.register(Gauge(name, documentation, labels, func))
+
+    def histogram(self, name, documentation, labels=(),
+                  buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+POLLS = REGISTRY.counter(
+    'homework_polls_total', 'Число опросов API Практикума.')
+API_LATENCY = REGISTRY.histogram(
+    'homework_api_request_seconds', 'Длительность запроса к API Практикума.')
+API_RESPONSES = REGISTRY.counter(
+    'homework_api_responses_total', 'Ответы API Практикума по HTTP-коду.',
+    ['code'])
+SKIPPED_PARSES = REGISTRY.counter(
+    'homework_skipped_parses_total',
+    'Ответов API, не разобранных из-за совпадения с предыдущим.', ['reason'])
+ERRORS = REGISTRY.counter(
+    'homework_errors_total', 'Ошибки опроса и разбора ответа по типу.',
+    ['type'])
+SEND_LATENCY = REGISTRY.histogram(
+    'homework_telegram_send_seconds', 'Длительность отправки в Telegram.')
+SEND_FAILURES = REGISTRY.counter(
+    'homework_telegram_send_failures_total',
+    'Ошибки отправки в Telegram по типу.', ['type'])
+NOTIFICATION_LATENCY = REGISTRY.histogram(
+    'homework_notification_latency_seconds',
+    'Задержка уведомления: end_to_end - от смены статуса в API, '
+    'pipeline - от начала опроса до доставки.', ['span'],
+    buckets=(0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600))
+TRACE_STAGE_LATENCY = REGISTRY.histogram(
+    'homework_notification_stage_seconds',
+    'Длительность этапа доставки уведомления.', ['stage'])
+CIRCUIT_STATE = REGISTRY.gauge(
+    'homework_circuit_state',
+    'Размыкатель цепи: 0 - замкнут, 1 - пробные запросы, 2 - разомкнут.',
+    ['endpoint'])
+LOOP_LAG = REGISTRY.gauge(
+    'homework_loop_lag_seconds', 'Опоздание последнего опроса от плана.')
+REGISTRY.gauge(
+    'homework_retry_time_seconds', 'Базовый интервал опроса RETRY_TIME.',
+    func=lambda: settings.RETRY_TIME)
+
+
+def serve(port=None, host=None):
+    """Запуск HTTP-сервера /metrics в фоновом потоке."""
+    # http.server нужен только процессу, который отдаёт метрики.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(
+        (host or settings.METRICS_HOST,
+         settings.METRICS_PORT if port is None else port), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True,
+                              name='metrics')
+    thread.start()
+    return server
@@ -0,0 +1,93 @@
+import json
+import sys
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def decode(body):
+    """Разбор JSON; orjson используется, если установлен."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+class Homework:
+    """Домашняя работа из ответа API: только нужные боту поля."""
+
+    __slots__ = ('key', 'id', 'status', 'lesson_name', 'date_updated')
+
+    def __init__(self, homework_id, status, lesson_name, date_updated=None):
+        self.id = homework_id
+        self.status = status
+        self.lesson_name = lesson_name
+        self.date_updated = date_updated
+        # Строка, чтобы ключи не менялись после сохранения в JSON.
+        self.key = str(homework_id or lesson_name)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Проверка и извлечение полей за один проход."""
+        if not isinstance(data, dict):
+            raise TypeError('Домашняя работа не является словарём')
+        status = data.get('status')
+        if status is None:
+            raise KeyError('нет ключа \'status\'')
+        lesson_name = data.get('lesson_name')
+        if lesson_name is None:
+            raise KeyError('нет ключа \'homework_name\'')
+        if isinstance(status, str):
+            # Статусов несколько, а работ - сотни тысяч.
+            status = sys.intern(status)
+        return cls(data.get('id'), status, lesson_name,
+                   data.get('date_updated'))
+
+    def __repr__(self):
+        return f'Homework(key={self.key!r}, status={self.status!r})'
+
+
+def iter_homeworks(data):
+    """Проверенные работы из ответа API по одной.
+    Ответ проверяется сразу, работы - по мере перебора.
+    """
+    if not isinstance(data, dict):
+        raise TypeError('Формат ответа API отличается от ожидаемого')
+    homeworks = data.get('homeworks')
+    if homeworks is None:
+        raise KeyError('Ответ API не содержит ключ \'homeworks\'')
+    if not isinstance(homeworks, list):
+        raise TypeError('Список домашних заданий не является списком')
+    return (Homework.from_dict(item) for item in homeworks)
+
+
+def latest(homeworks):
+    """Последняя по date_updated работа или None для пустого списка.
+    При равном времени берётся первая: API отдаёт новые работы первыми.
+    """
+    return max(homeworks, key=lambda homework: homework.date_updated or '',
+               default=None)
+
+
+class ApiResponse:
+    """Проверенный ответ API Практикума."""
+
+    __slots__ = ('homeworks', 'current_date', 'validators')
+
+    def __init__(self, homeworks, current_date=None):
+        self.homeworks = homeworks
+        self.current_date = current_date
+        # Валидаторы ответа (ETag, Last-Modified, хэш тела); подписка
+        # запоминает их только после успешной обработки ответа.
+        self.validators = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Проверка ответа, те же ошибки, что и в check_response."""
+        return cls(tuple(iter_homeworks(data)), data.get('current_date'))
+
+    @classmethod
+    def from_bytes(cls, body):
+        """Разбор и проверка тела ответа."""
+        return cls.from_dict(decode(body))
@@ -0,0 +1,302 @@
+import collections
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+# Очередь, в которую notify() складывает сообщения (см. install()).
+queue = None
+
+
+class Entry:
+    """Сообщение в очереди на отправку."""
+
+    __slots__ = ('id', 'chat_id', 'text', 'image', 'attempts')
+
+    def __init__(self, entry_id, chat_id, text, image=None, attempts=0):
+        self.id = entry_id
+        self.chat_id = chat_id
+        self.text = text
+        self.image = image
+        self.attempts = attempts
+
+
+class Outbox:
+    """Персистентная очередь исходящих сообщений.
+    Журнал на диске только дописывается: put - новое сообщение,
+    ack - доставлено. При старте журнал перечитывается и сжимается.
+    Сообщения одного чата уходят строго по порядку.
+    """
+
+    def __init__(self, path=None, fsync=None, compact_after=None,
+                 clock=time.monotonic, coalesce_window=0):
+        self.path = path or settings.OUTBOX_FILE
+        self.fsync = settings.OUTBOX_FSYNC if fsync is None else fsync
+        self.compact_after = compact_after or settings.OUTBOX_COMPACT_AFTER
+        self.clock = clock
+        # Первое сообщение чата ждёт coalesce_window секунд, чтобы
+        # следующие успели встать за ним и уйти вместе (см. pending()).
+        self.coalesce_window = coalesce_window
+        self._cond = threading.Condition()
+        self._chats = {}
+        self._ready = []
+        self._busy = set()
+        self._order = itertools.count()
+        self._acked = 0
+        self._next_id = 1
+        self._replay()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        pending = collections.OrderedDict()
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Недописанная при аварии строка.
+                        continue
+                    if record['op'] == 'put':
+                        pending[record['id']] = Entry(
+                            record['id'], record['chat_id'], record['text'],
+                            record.get('image'))
+                    else:
+                        pending.pop(record['id'], None)
+                    self._next_id = max(self._next_id, record['id'] + 1)
+        self._rewrite(pending.values())
+        for entry in pending.values():
+            self._push(entry)
+        if pending:
+            logger.info('Из очереди восстановлено сообщений: %d',
+                        len(pending))
+
+    def _rewrite(self, entries):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            for entry in entries:
+                file.write(self._record('put', entry))
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _record(op, entry):
+        record = {'op': op, 'id': entry.id}
+        if op == 'put':
+            record.update(chat_id=entry.chat_id, text=entry.text,
+                          image=entry.image)
+        return json.dumps(record, ensure_ascii=False) + '\n'
+
+    def _append(self, line):
+        self._file.write(line)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _push(self, entry, delay=0):
+        chat = self._chats.get(entry.chat_id)
+        if chat is None:
+            chat = self._chats[entry.chat_id] = collections.deque()
+            heapq.heappush(self._ready, (self.clock() + delay,
+                                         next(self._order), entry.chat_id))
+        chat.append(entry)
+
+    def put(self, chat_id, text, image=None):
+        """Добавление сообщения (и картинки статуса) в очередь.
+        Уведомление (templates.Notification) хранится как есть,
+        чтобы при отправке была доступна его трасса.
+        """
+        if not isinstance(text, str):
+            text = str(text)
+        with self._cond:
+            entry = Entry(self._next_id, chat_id, text, image)
+            self._next_id += 1
+            self._append(self._record('put', entry))
+            self._push(entry, self.coalesce_window)
+            self._cond.notify()
+        return entry
+
+    def take(self, timeout=None):
+        """Первое готовое к отправке сообщение или None по таймауту."""
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._cond:
+            while True:
+                now = self.clock()
+                if self._ready and self._ready[0][0] <= now:
+                    _, _, chat_id = heapq.heappop(self._ready)
+                    self._busy.add(chat_id)
+                    return self._chats[chat_id][0]
+                wait = None if deadline is None else deadline - now
+                if self._ready:
+                    delay = self._ready[0][0] - now
+                    wait = delay if wait is None else min(wait, delay)
+                if wait is not None and wait <= 0:
+                    return None
+                self._cond.wait(wait)
+
+    def pending(self, chat_id, limit=None):
+        """Сообщения чата по порядку, начиная с выданного take()."""
+        with self._cond:
+            return list(itertools.islice(self._chats.get(chat_id, ()),
+                                         limit))
+
+    def ack(self, *entries):
+        """Отметка о доставке сообщений одного чата.
+        Несколько сообщений - первые в очереди чата, отправленные вместе.
+        """
+        chat_id = entries[0].chat_id
+        with self._cond:
+            for entry in entries:
+                self._append(self._record('ack', entry))
+            self._busy.discard(chat_id)
+            chat = self._chats[chat_id]
+            for _ in entries:
+                chat.popleft()
+            if chat:
+                heapq.heappush(self._ready,
+                               (self.clock(), next(self._order), chat_id))
+            else:
+                del self._chats[chat_id]
+            self._acked += len(entries)
+            if self._acked >= self.compact_after and not self._busy:
+                self._compact()
+            self._cond.notify()
+
+    def retry(self, entry, delay):
+        """Возврат сообщения в очередь с повтором через delay секунд."""
+        with self._cond:
+            entry.attempts += 1
+            self._busy.discard(entry.chat_id)
+            heapq.heappush(self._ready, (self.clock() + delay,
+                                         next(self._order), entry.chat_id))
+            self._cond.notify()
+
+    def _compact(self):
+        self._file.close()
+        self._rewrite(entry for chat in self._chats.values()
+                      for entry in chat)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._acked = 0
+
+    def __len__(self):
+        with self._cond:
+            return sum(len(chat) for chat in self._chats.values())
+
+    def close(self):
+        """Закрытие журнала."""
+        with self._cond:
+            self._file.close()
+
+
+class OutboxSender:
+    """Фоновые потоки, отправляющие сообщения из очереди с повторами.
+    Если задан coalesce(тексты), ожидающие сообщения одного чата
+    уходят одним сообщением с картинкой первого из них.
+    """
+
+    def __init__(self, outbox, deliver, workers=None, is_permanent=None,
+                 coalesce=None, max_batch=None):
+        self.outbox = outbox
+        self.deliver = deliver
+        # Ошибки, которые повтором не исправить (бот заблокирован и т.п.).
+        self.is_permanent = is_permanent or (lambda error: False)
+        self.workers = workers or settings.OUTBOX_WORKERS
+        self.coalesce = coalesce
+        self.max_batch = max_batch or settings.OUTBOX_COALESCE_MAX
+        self._stop = threading.Event()
+        self._threads = []
+
+    @staticmethod
+    def backoff(attempts):
+        """Экспоненциальная задержка перед повтором."""
+        return min(settings.OUTBOX_BACKOFF_BASE * 2 ** min(attempts, 32),
+                   settings.OUTBOX_BACKOFF_MAX)
+
+    def batch(self, entry):
+        """Сообщения чата для одной отправки, начиная с entry.
+        Объединённый текст не длиннее лимита сообщения Telegram.
+        """
+        if self.coalesce is None:
+            return [entry]
+        entries = []
+        length = -1
+        for candidate in self.outbox.pending(entry.chat_id, self.max_batch):
+            length += len(candidate.text) + 1
+            if entries and length > settings.TELEGRAM_MESSAGE_MAX_LENGTH:
+                break
+            entries.append(candidate)
+        return entries or [entry]
+
+    def _send(self, entries):
+        if len(entries) == 1:
+            entry = entries[0]
+            self.deliver(entry.chat_id, entry.text, entry.image)
+            return
+        image = next((entry.image for entry in entries if entry.image), None)
+        self.deliver(entries[0].chat_id,
+                     self.coalesce([entry.text for entry in entries]), image)
+
+    def _work(self):
+        while not self._stop.is_set():
+            entry = self.outbox.take(timeout=1)
+            if entry is None:
+                continue
+            entries = self.batch(entry)
+            try:
+                self._send(entries)
+            except Exception as error:
+                if self.is_permanent(error):
+                    logger.error('Сообщение не может быть доставлено: %s',
+                                 error, extra={'chat_id': entry.chat_id})
+                    self.outbox.ack(*entries)
+                    continue
+                delay = self.backoff(entry.attempts)
+                logger.warning(
+                    'Ошибка отправки сообщения %s, повтор через %.0f с',
+                    error, delay, extra={'chat_id': entry.chat_id})
+                self.outbox.retry(entry, delay)
+            else:
+                if len(entries) > 1:
+                    logger.debug('Объединено сообщений: %d', len(entries),
+                                 extra={'chat_id': entry.chat_id})
+                self.outbox.ack(*entries)
+
+    def start(self):
+        """Запуск фоновых потоков отправки."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True,
+                                      name=f'outbox-{index}')
+            thread.start()
+            self._threads.append(thread)
+
+    def drain(self, timeout):
+        """Ожидание отправки всей очереди не дольше timeout секунд.
+        Неотправленное остаётся в журнале и уйдёт после перезапуска.
+        """
+        deadline = time.monotonic() + timeout
+        while len(self.outbox) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        return len(self.outbox) == 0
+
+    def stop(self, timeout=None):
+        """Остановка потоков после текущих отправок.
+        timeout - общий срок на все потоки, а не на каждый.
+        """
+        self._stop.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None
+                        else max(0, deadline - time.monotonic()))
+
+
+def install(outbox):
+    """Установка очереди, через которую пойдут все уведомления."""
+    global queue
+    queue = outbox
+    return queue
@@ -0,0 +1,130 @@
+import collections
+import threading
+import time
+
+import settings
+
+
+class RateLimitExceeded(Exception):
+    """Не удалось дождаться свободного места в лимите."""
+
+
+class TokenBucket:
+    """Потокобезопасное «ведро с токенами».
+    acquire() ждёт появления токена, а не отказывает сразу.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+        self.stats = {'acquired': 0, 'throttled': 0, 'dropped': 0}
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+    def reserve(self):
+        """Забрать токен; вернуть время ожидания до его появления."""
+        with self._lock:
+            self._refill(self.clock())
+            self.tokens -= 1
+            self.stats['acquired'] += 1
+            if self.tokens >= 0:
+                return 0
+            self.stats['throttled'] += 1
+            return -self.tokens / self.rate
+
+    def cancel(self):
+        """Вернуть токен, если запрос так и не был выполнен."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+            self.stats['acquired'] -= 1
+            self.stats['dropped'] += 1
+
+    def acquire(self, max_wait=None):
+        """Ожидание свободного токена не дольше max_wait секунд."""
+        delay = self.reserve()
+        if max_wait is not None and delay > max_wait:
+            self.cancel()
+            raise RateLimitExceeded(
+                f'превышен лимит запросов, ожидание {delay:.1f} с')
+        if delay:
+            self.sleep(delay)
+
+
+class KeyedLimiter:
+    """Отдельное ведро на каждый ключ (например, chat_id)."""
+
+    def __init__(self, rate, capacity=None, max_keys=None, **kwargs):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys or settings.RATE_LIMIT_MAX_KEYS
+        self.kwargs = kwargs
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def bucket(self, key):
+        """Ведро для ключа; давно не используемые вытесняются."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(
+                    self.rate, self.capacity, **self.kwargs)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def acquire(self, key, max_wait=None):
+        """Ожидание токена для ключа."""
+        self.bucket(key).acquire(max_wait)
+
+
+def configure(workers=1):
+    """Общие лимиты API для одного из workers процессов.
+    Лимиты Практикума и Telegram считаются на весь бот, поэтому
+    каждый воркер получает свою долю.
+    """
+    global practicum, telegram_global
+    practicum = TokenBucket(settings.PRACTICUM_RATE_LIMIT / workers,
+                            max(1, settings.PRACTICUM_RATE_BURST // workers))
+    telegram_global = TokenBucket(
+        settings.TELEGRAM_RATE_LIMIT / workers,
+        max(1, settings.TELEGRAM_RATE_BURST // workers))
+
+
+configure()
+
+telegram_chat = KeyedLimiter(settings.TELEGRAM_CHAT_RATE_LIMIT,
+                             settings.TELEGRAM_CHAT_RATE_BURST)
+STATS = {'telegram_retry_after': 0, 'telegram_dropped': 0}
+_stats_lock = threading.Lock()
+
+
+def count(key):
+    """Увеличение счётчика STATS."""
+    with _stats_lock:
+        STATS[key] += 1
+
+
+def acquire_telegram(chat_id):
+    """Ожидание места в общем лимите Telegram и в лимите чата."""
+    telegram_chat.acquire(chat_id, settings.RATE_LIMIT_MAX_WAIT)
+    telegram_global.acquire(settings.RATE_LIMIT_MAX_WAIT)
+
+
+def stats():
+    """Счётчики всех лимитеров."""
+    return {
+        'practicum': dict(practicum.stats),
+        'telegram': dict(telegram_global.stats),
+        **STATS,
+    }
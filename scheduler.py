@@ -0,0 +1,157 @@
+import heapq
+import itertools
+import random
+import time
+
+import settings
+
+
+class AdaptiveInterval:
+    """Интервал следующего опроса по статусу и истории подписки.
+    Пока хотя бы одна работа на проверке, опрашиваем чаще; без изменений
+    интервал растёт экспоненциально. Границы и разброс берутся из settings.
+    """
+
+    def __init__(self, base=None, min_interval=None, max_interval=None,
+                 backoff=None, jitter=None, fast_statuses=None,
+                 fast_interval=None, rand=random.random):
+        self.base = base or settings.RETRY_TIME
+        self.min_interval = min_interval or settings.POLL_MIN_INTERVAL
+        self.max_interval = max_interval or settings.POLL_MAX_INTERVAL
+        self.backoff = backoff or settings.POLL_IDLE_BACKOFF
+        self.jitter = settings.POLL_JITTER if jitter is None else jitter
+        self.fast_statuses = (settings.POLL_FAST_STATUSES
+                              if fast_statuses is None else fast_statuses)
+        self.fast_interval = fast_interval or settings.POLL_FAST_INTERVAL
+        self.rand = rand
+
+    def is_fast(self, subscription):
+        """Есть ли у подписки работа в статусе из fast_statuses."""
+        if subscription.status in self.fast_statuses:
+            return True
+        return any(status in self.fast_statuses
+                   for status in subscription.homeworks.values())
+
+    def __call__(self, subscription):
+        if self.is_fast(subscription):
+            interval = self.fast_interval
+        else:
+            # Ограничиваем степень, чтобы не считать огромные числа.
+            power = min(subscription.idle_polls, 32)
+            interval = self.base * self.backoff ** power
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        spread = interval * self.jitter
+        return interval + spread * (2 * self.rand() - 1)
+
+
+class PollScheduler:
+    """Планировщик опросов: равномерно распределяет подписки
+    по интервалу settings.RETRY_TIME вместо одновременного опроса.
+    """
+
+    def __init__(self, interval=None, clock=time.monotonic, sleep=time.sleep,
+                 policy=None):
+        self.interval = interval or settings.RETRY_TIME
+        # Без политики интервал фиксированный и фаза подписки сохраняется.
+        self.policy = policy
+        self.clock = clock
+        self.sleep = sleep
+        self._heap = []
+        self._counter = itertools.count()
+        # id() снятых с опроса подписок: запись в куче удаляется лениво.
+        self._removed = set()
+
+    def schedule(self, subscription, due):
+        """Постановка подписки в очередь на момент due."""
+        heapq.heappush(self._heap, (due, next(self._counter), subscription))
+
+    def spread(self, subscriptions):
+        """Первичная расстановка подписок с равным шагом."""
+        subscriptions = list(subscriptions)
+        if not subscriptions:
+            return
+        step = self.interval / len(subscriptions)
+        start = self.clock()
+        for index, subscription in enumerate(subscriptions):
+            self.schedule(subscription, start + index * step)
+
+    def restore(self, subscriptions, wall_now=None):
+        """Расстановка подписок после перезапуска.
+        Подписка с известным временем прошлого опроса ставится на тот срок,
+        что наступил бы без перезапуска; просроченные и новые
+        распределяются по интервалу, как в spread().
+        """
+        wall_now = time.time() if wall_now is None else wall_now
+        now = self.clock()
+        pending = []
+        for subscription in subscriptions:
+            if not subscription.polled_at:
+                pending.append(subscription)
+                continue
+            interval = (self.interval if self.policy is None
+                        else self.policy(subscription))
+            delay = subscription.polled_at + interval - wall_now
+            if delay > 0:
+                self.schedule(subscription, now + delay)
+            else:
+                pending.append(subscription)
+        self.spread(pending)
+
+    def remove(self, subscription):
+        """Снятие подписки с опроса."""
+        self._removed.add(id(subscription))
+
+    def reschedule(self, subscription, when, now):
+        """Постановка подписки на следующий опрос после опроса в when."""
+        if id(subscription) in self._removed:
+            self._removed.discard(id(subscription))
+            return
+        if self.policy is None:
+            # Сохраняем фазу подписки, чтобы опросы не слипались.
+            due = max(when + self.interval, now)
+        else:
+            due = now + self.policy(subscription)
+        self.schedule(subscription, due)
+
+    def park(self, subscription):
+        """Подписка вне очереди до следующего schedule().
+        Её снятие с опроса уже ничего не должно удалять из кучи.
+        """
+        self._removed.discard(id(subscription))
+
+    def pop_due(self, now):
+        """Извлечение всех подписок, время опроса которых наступило."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, subscription = heapq.heappop(self._heap)
+            if id(subscription) in self._removed:
+                self._removed.discard(id(subscription))
+                continue
+            due.append((when, subscription))
+        return due
+
+    def next_due(self):
+        """Время ближайшего опроса или None при пустой очереди."""
+        return self._heap[0][0] if self._heap else None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def run_once(self, poll):
+        """Один шаг цикла: опрос наступивших подписок и ожидание."""
+        now = self.clock()
+        for when, subscription in self.pop_due(now):
+            try:
+                poll(subscription)
+            finally:
+                self.reschedule(subscription, when, self.clock())
+        next_due = self.next_due()
+        if next_due is None:
+            self.sleep(self.interval)
+        else:
+            self.sleep(max(0, next_due - self.clock()))
+
+    def run(self, poll):
+        """Бесконечный цикл опроса подписок."""
+        while True:
+            self.run_once(poll)
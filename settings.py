@@ -1,5 +1,18 @@
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 RETRY_TIME = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+# Переменные окружения позволяют направить бота на локальные
+# заменители API (stand_in.py).
+ENDPOINT = os.getenv(
+    'PRACTICUM_ENDPOINT',
+    'https://practicum.yandex.ru/api/user_api/homework_statuses/')
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL')
+# Проверка токенов при запуске: таймаут запроса, секунды; 0 - без проверки.
+PREFLIGHT_TIMEOUT = 10
+# Бюджет времени импорта homework, секунды (см. import_report.py).
+IMPORT_TIME_BUDGET = 0.15
 
 HOMEWORK_STATUSES = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -7,4 +20,147 @@ HOMEWORK_STATUSES = {
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
 
-# IMG = ['approved.jpg', 'reviewing.jpg', 'rejected.jpg']
\ No newline at end of file
+# IMG = ['approved.jpg', 'reviewing.jpg', 'rejected.jpg']
+
+# JSON-файл со списком подписок [{"token": ..., "chat_id": ...}].
+SUBSCRIPTIONS_FILE = os.path.join(BASE_DIR, 'subscriptions.json')
+
+# Ограничения параллельности асинхронного движка.
+MAX_CONCURRENT_POLLS = 100
+MAX_CONCURRENT_SENDS = 30
+
+# HTTP-клиент API Практикума: пул соединений, таймауты, повторы.
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = MAX_CONCURRENT_POLLS
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 30
+HTTP_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_BACKOFF_JITTER = 0.5
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Картинки статусов и кэш их file_id в Telegram.
+IMAGE_DIR = BASE_DIR
+PHOTO_CACHE_FILE = os.path.join(BASE_DIR, 'photo_cache.json')
+
+# Хранилище состояния подписок: 'sqlite' или 'memory'.
+STATE_BACKEND = 'sqlite'
+STATE_DB = os.path.join(BASE_DIR, 'state.sqlite3')
+# Запись на диск не чаще раза в STATE_FLUSH_INTERVAL секунд
+# или при накоплении STATE_FLUSH_BATCH изменённых подписок.
+STATE_FLUSH_INTERVAL = 30
+STATE_FLUSH_BATCH = 500
+
+# Адаптивный интервал опроса: пока работа на проверке - чаще,
+# без изменений интервал растёт в POLL_IDLE_BACKOFF раз за опрос.
+POLL_FAST_STATUSES = ('reviewing',)
+POLL_FAST_INTERVAL = 120
+POLL_MIN_INTERVAL = 60
+POLL_MAX_INTERVAL = 6 * 60 * 60
+POLL_IDLE_BACKOFF = 1.5
+POLL_JITTER = 0.1
+# Первый опрос новой подписки загружает всю историю работ токена
+# в индекс статусов без уведомлений; дальше опросы идут только
+# с current_date из ответа, в том числе после простоя.
+SYNC_HISTORY = True
+
+# Лимиты запросов (в секунду) и размер «всплеска».
+PRACTICUM_RATE_LIMIT = 10
+PRACTICUM_RATE_BURST = 20
+# Bot API: не больше 30 сообщений в секунду всего и 1 в секунду на чат.
+TELEGRAM_RATE_LIMIT = 30
+TELEGRAM_RATE_BURST = 30
+TELEGRAM_CHAT_RATE_LIMIT = 1
+TELEGRAM_CHAT_RATE_BURST = 3
+# Максимальное ожидание места в лимите; None - ждать сколько нужно.
+RATE_LIMIT_MAX_WAIT = None
+RATE_LIMIT_MAX_KEYS = 100000
+# Сколько раз повторять отправку после ответа 429 (RetryAfter).
+TELEGRAM_RETRY_AFTER_ATTEMPTS = 3
+# Текст уведомления уходит подписью к картинке статуса одним запросом,
+# если помещается в подпись; иначе - сообщением и картинкой отдельно.
+PHOTO_CAPTIONS = True
+TELEGRAM_CAPTION_MAX_LENGTH = 1024
+TELEGRAM_MESSAGE_MAX_LENGTH = 4096
+
+# Размыкатель цепи для API Практикума и Telegram: после
+# CIRCUIT_FAILURE_THRESHOLD сбоев подряд запросы не выполняются
+# CIRCUIT_RESET_TIMEOUT секунд, затем пропускается CIRCUIT_HALF_OPEN_PROBES
+# пробных запросов. Неудачная проба удваивает паузу до максимума.
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30
+CIRCUIT_MAX_RESET_TIMEOUT = 600
+CIRCUIT_HALF_OPEN_PROBES = 1
+
+# Уведомления об ошибках: ошибка одного типа сообщается один раз,
+# пока повторяется чаще, чем раз в ERROR_SUPPRESS_WINDOW секунд;
+# число повторов приходит сводкой раз в ERROR_DIGEST_INTERVAL секунд.
+ERROR_SUPPRESS_WINDOW = 60 * 60
+ERROR_DIGEST_INTERVAL = 60 * 60
+
+# Трассы уведомлений от смены статуса до доставки (None - не писать
+# в файл) и число последних доставок в сводке перцентилей задержки.
+TRACE_FILE = os.path.join(BASE_DIR, 'traces.jsonl')
+TRACE_WINDOW = 1000
+
+# Персистентная очередь исходящих сообщений.
+OUTBOX_FILE = os.path.join(BASE_DIR, 'outbox.jsonl')
+OUTBOX_FSYNC = False
+OUTBOX_COMPACT_AFTER = 1000
+OUTBOX_WORKERS = 4
+OUTBOX_BACKOFF_BASE = 1
+OUTBOX_BACKOFF_MAX = 300
+OUTBOX_STOP_TIMEOUT = 10
+# Сообщения одного чата, поставленные в очередь в пределах
+# OUTBOX_COALESCE_WINDOW секунд, уходят одним сообщением
+# (не больше OUTBOX_COALESCE_MAX); 0 - объединяются только
+# ожидающие отправки (например, после ошибки или лимита).
+OUTBOX_COALESCE_WINDOW = 1
+OUTBOX_COALESCE_MAX = 10
+
+# Плавная остановка по SIGTERM: сколько секунд ждать текущих опросов
+# и отправки очереди (Heroku даёт 30 с до SIGKILL).
+SHUTDOWN_TIMEOUT = 25
+# Как часто проверять изменение settings.py, файла подписок и шаблонов
+# для перечитывания без перезапуска (как по SIGHUP). None - не проверять.
+RELOAD_CHECK_INTERVAL = 5
+
+# Несколько процессов-воркеров (WORKERS > 1): подписки делятся между ними
+# согласованным хешированием ключа подписки, состав воркеров определяется
+# по сердцебиениям в общей базе STATE_DB.
+SHARD_WORKERS = int(os.getenv('WORKERS', '1'))
+SHARD_VNODES = 64
+SHARD_HEARTBEAT_INTERVAL = 10
+SHARD_HEARTBEAT_TIMEOUT = 30
+# Подписка, перешедшая от другого воркера, опрашивается не раньше,
+# чем через столько секунд после смены состава.
+SHARD_HANDOFF_DELAY = 60
+
+# Метрики в формате Prometheus на http://METRICS_HOST:METRICS_PORT/metrics.
+# None - не запускать сервер метрик.
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9100
+
+# Соединений к Bot API: отправка из очереди, команды, опрос обновлений.
+TELEGRAM_POOL_SIZE = OUTBOX_WORKERS + 8
+# Потоков обработки команд пользователей.
+COMMAND_WORKERS = 4
+# Подписок в одном чате через /subscribe.
+MAX_CHAT_SUBSCRIPTIONS = 5
+
+# Логирование: уровень, формат ('json' или 'text') и выборка
+# повторяющихся DEBUG-сообщений (выводится одно из LOG_SAMPLE_EVERY).
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_SAMPLE_EVERY = 100
+
+# Шаблоны уведомлений. Файл STATUS_TEMPLATES_FILE (если есть) задаёт
+# статусы без изменения кода:
+# {"messages": {"ru": "..."},
+#  "statuses": {"approved": {"image": "approved", "text": {"ru": "..."}}}}
+LOCALE = os.getenv('LOCALE', 'ru')
+MESSAGE_TEMPLATES = {
+    'ru': 'Изменился статус проверки работы "{homework_name}". {verdict}',
+    'en': 'Review status of "{homework_name}" has changed. {verdict}',
+}
+STATUS_TEMPLATES_FILE = os.path.join(BASE_DIR, 'status_templates.json')
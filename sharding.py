@@ -0,0 +1,238 @@
+import bisect
+import hashlib
+import logging
+import signal
+import sqlite3
+import threading
+import time
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(value):
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HashRing:
+    """Кольцо согласованного хеширования.
+    При добавлении или уходе воркера переезжает только ~1/N подписок.
+    """
+
+    def __init__(self, nodes=(), replicas=None):
+        self.replicas = replicas or settings.SHARD_VNODES
+        self._hashes = []
+        self._nodes = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self):
+        return set(self._nodes)
+
+    def add(self, node):
+        for replica in range(self.replicas):
+            point = _hash(f'{node}#{replica}')
+            index = bisect.bisect(self._hashes, point)
+            self._hashes.insert(index, point)
+            self._nodes.insert(index, node)
+
+    def remove(self, node):
+        points = [(point, owner) for point, owner
+                  in zip(self._hashes, self._nodes) if owner != node]
+        self._hashes = [point for point, _ in points]
+        self._nodes = [owner for _, owner in points]
+
+    def owner(self, key):
+        """Воркер, которому принадлежит ключ, или None для пустого кольца."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+class Membership:
+    """Состав воркеров по сердцебиениям в общей базе SQLite."""
+
+    def __init__(self, worker_id, path=None, timeout=None, clock=time.time):
+        self.worker_id = worker_id
+        self.timeout = timeout or settings.SHARD_HEARTBEAT_TIMEOUT
+        self.clock = clock
+        self.connection = sqlite3.connect(
+            path or settings.STATE_DB, timeout=30, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS shard_workers ('
+                'worker_id TEXT PRIMARY KEY, heartbeat REAL NOT NULL)')
+
+    def heartbeat(self):
+        """Отметка о том, что воркер жив; список живых воркеров."""
+        now = self.clock()
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO shard_workers (worker_id, heartbeat) '
+                'VALUES (?, ?)', (self.worker_id, now))
+            self.connection.execute(
+                'DELETE FROM shard_workers WHERE heartbeat < ?',
+                (now - self.timeout,))
+            rows = self.connection.execute(
+                'SELECT worker_id FROM shard_workers ORDER BY worker_id'
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def leave(self):
+        """Уход из состава: подписки сразу переходят другим воркерам."""
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM shard_workers WHERE worker_id = ?',
+                (self.worker_id,))
+        self.connection.close()
+
+
+class Shard:
+    """Доля подписок одного воркера.
+    Подписка, перешедшая от другого воркера, опрашивается не раньше
+    handoff_delay секунд после смены состава и с состоянием из общего
+    хранилища: прежний владелец успевает закончить опрос и сохранить
+    состояние, поэтому уведомления не дублируются.
+    Чужие подписки откладываются до смены состава; те, что перешли
+    к воркеру, забираются через handoffs().
+    """
+
+    def __init__(self, worker_id, membership=None, handoff_delay=None,
+                 interval=None, clock=time.monotonic):
+        self.worker_id = worker_id
+        self.membership = membership
+        self.handoff_delay = (settings.SHARD_HANDOFF_DELAY
+                              if handoff_delay is None else handoff_delay)
+        self.interval = interval or settings.SHARD_HEARTBEAT_INTERVAL
+        self.clock = clock
+        self.ring = HashRing([worker_id])
+        # Пока состав не известен, чужие подписки могут опрашиваться.
+        self.changed_at = clock()
+        # Ключи подписок, которые воркер уже опрашивает как владелец.
+        self._settled = set()
+        # Отложенные чужие подписки: ключ -> подписка.
+        self._parked = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def update(self, workers):
+        """Новый состав воркеров."""
+        workers = set(workers) | {self.worker_id}
+        if workers == self.ring.nodes:
+            return False
+        self.ring = HashRing(sorted(workers))
+        self.changed_at = self.clock()
+        logger.info('Состав воркеров изменился: %d', len(workers))
+        return True
+
+    def owns(self, subscription):
+        return self.ring.owner(subscription.key) == self.worker_id
+
+    def claim(self, subscription, store):
+        """True, если подписку сейчас опрашивает этот воркер."""
+        key = subscription.key
+        if not self.owns(subscription):
+            self._settled.discard(key)
+            with self._lock:
+                self._parked[key] = subscription
+            return False
+        if key in self._settled:
+            return True
+        if self.clock() - self.changed_at < self.handoff_delay:
+            return False
+        store.load(subscription)
+        self._settled.add(key)
+        return True
+
+    def ready_at(self):
+        """Момент (по clock), с которого перешедшие подписки опрашиваются."""
+        return self.changed_at + self.handoff_delay
+
+    def handoffs(self):
+        """Отложенные подписки, перешедшие к воркеру при смене состава."""
+        with self._lock:
+            owned = [subscription for subscription in self._parked.values()
+                     if self.owns(subscription)]
+            for subscription in owned:
+                del self._parked[subscription.key]
+        return owned
+
+    def tick(self, on_tick=None):
+        """Сердцебиение и обновление состава."""
+        if self.membership is not None:
+            self.update(self.membership.heartbeat())
+        if on_tick is not None:
+            on_tick()
+
+    def _run(self, on_tick):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick(on_tick)
+            except Exception:
+                logger.exception('Ошибка обновления состава воркеров')
+
+    def start(self, on_tick=None):
+        """Первое сердцебиение и фоновый поток обновления состава.
+        on_tick() вызывается после каждого сердцебиения
+        (сброс состояния, чтобы новый владелец его увидел).
+        """
+        self.tick()
+        self._thread = threading.Thread(target=self._run, args=(on_tick,),
+                                        daemon=True, name='shard')
+        self._thread.start()
+
+    def stop(self):
+        """Остановка потока и уход из состава."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.membership is not None:
+            self.membership.leave()
+
+
+def supervise(target, workers, restart_delay=1):
+    """Запуск и перезапуск workers процессов target(index).
+    SIGTERM и SIGINT передаются воркерам для плавной остановки.
+    """
+    import multiprocessing
+    context = multiprocessing.get_context('spawn')
+    stopping = threading.Event()
+    processes = {}
+
+    def spawn(index):
+        process = context.Process(target=target, args=(index,),
+                                  name=f'worker-{index}')
+        process.start()
+        processes[index] = process
+        logger.info('Запущен воркер %d (pid %d)', index, process.pid)
+
+    def stop(signum, frame):
+        stopping.set()
+
+    previous = {signum: signal.signal(signum, stop)
+                for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        for index in range(workers):
+            spawn(index)
+        while not stopping.wait(restart_delay):
+            for index, process in list(processes.items()):
+                if not process.is_alive():
+                    logger.error('Воркер %d завершился с кодом %s',
+                                 index, process.exitcode)
+                    spawn(index)
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + settings.SHUTDOWN_TIMEOUT + 5
+        for process in processes.values():
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
@@ -0,0 +1,304 @@
+"""Локальные заменители API Практикума и Telegram Bot API.
+
+Запуск: python stand_in.py --practicum-port 8081 --telegram-port 8082
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STATUSES = ('reviewing', 'rejected', 'approved')
+
+
+class Behaviour:
+    """Задержка и доля ошибок ответа заменителя."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+
+    def outcome(self):
+        """'ok', 'error' или 'throttle' после имитации задержки."""
+        if self.latency:
+            time.sleep(self.latency)
+        roll = random.random()
+        if roll < self.error_rate:
+            return 'error'
+        if roll < self.error_rate + self.throttle_rate:
+            return 'throttle'
+        return 'ok'
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, code, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakePracticum:
+    """Заменитель API статусов домашних работ.
+    У каждого токена одна работа, статус которой меняется
+    с вероятностью change_rate при каждом запросе.
+    Если задан valid_tokens, остальные токены получают 401.
+    """
+
+    def __init__(self, behaviour=None, change_rate=0.05, host='127.0.0.1',
+                 port=0, valid_tokens=None):
+        self.behaviour = behaviour or Behaviour()
+        self.change_rate = change_rate
+        self.valid_tokens = valid_tokens
+        self.lock = threading.Lock()
+        self.homeworks = {}
+        # lesson_name -> моменты смены статуса (time.time()).
+        self.changed_at = {}
+        self.requests = 0
+        stand_in = self
+
+        class Handler(_JsonHandler):
+
+            def do_GET(self):
+                stand_in.handle(self)
+
+        self.server = _StandInServer((host, port), Handler)
+
+    @property
+    def endpoint(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/api/user_api/homework_statuses/'
+
+    def _homework(self, token, now):
+        homework = self.homeworks.get(token)
+        if homework is None:
+            homework = self.homeworks[token] = {
+                'id': len(self.homeworks) + 1,
+                'status': None,
+                'lesson_name': f'hw-{len(self.homeworks) + 1}',
+                'updated': 0,
+            }
+        if random.random() < self.change_rate:
+            homework['status'] = random.choice(
+                [status for status in STATUSES
+                 if status != homework['status']])
+            homework['updated'] = now
+            self.changed_at.setdefault(
+                homework['lesson_name'], []).append(now)
+        return homework
+
+    def handle(self, request):
+        with self.lock:
+            self.requests += 1
+        outcome = self.behaviour.outcome()
+        if outcome == 'error':
+            request.reply(500, {'code': 'internal_error'})
+            return
+        if outcome == 'throttle':
+            request.reply(429, {'code': 'too_many_requests'},
+                          {'Retry-After': str(self.behaviour.retry_after)})
+            return
+        token = request.headers.get('Authorization', '')[len('OAuth '):]
+        if self.valid_tokens is not None and token not in self.valid_tokens:
+            request.reply(401, {'code': 'not_authenticated',
+                                'message': 'Учетные данные не были '
+                                           'предоставлены.'})
+            return
+        query = parse_qs(urlparse(request.path).query)
+        from_date = int(float(query.get('from_date', ['0'])[0]))
+        now = time.time()
+        with self.lock:
+            homework = self._homework(token, now)
+        homeworks = []
+        if homework['status'] and homework['updated'] >= from_date:
+            homeworks.append({
+                'id': homework['id'],
+                'status': homework['status'],
+                'lesson_name': homework['lesson_name'],
+                'homework_name': homework['lesson_name'],
+                'date_updated': time.strftime(
+                    '%Y-%m-%dT%H:%M:%SZ', time.gmtime(homework['updated'])),
+            })
+        request.reply(200, {'homeworks': homeworks,
+                            'current_date': int(now)})
+
+
+class FakeTelegram:
+    """Заменитель Bot API: sendMessage, sendPhoto, getMe, getUpdates.
+    Если задан valid_tokens, остальные токены получают 401.
+    """
+
+    LESSON_RE = re.compile(r'"(hw-\d+)"')
+
+    def __init__(self, behaviour=None, host='127.0.0.1', port=0,
+                 valid_tokens=None):
+        self.behaviour = behaviour or Behaviour()
+        self.valid_tokens = valid_tokens
+        self.lock = threading.Lock()
+        # (chat_id, текст) сообщений и подписей к картинкам.
+        self.messages = []
+        self.photos = 0
+        # (lesson_name, время доставки) для подсчёта задержки уведомлений.
+        self.deliveries = []
+        self._message_id = 0
+        stand_in = self
+
+        class Handler(_JsonHandler):
+
+            def do_GET(self):
+                stand_in.handle(self, {})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                stand_in.handle(self, stand_in.parse(
+                    self.headers.get('Content-Type', ''),
+                    self.rfile.read(length)))
+
+        self.server = _StandInServer((host, port), Handler)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/bot'
+
+    @staticmethod
+    def parse(content_type, body):
+        """Поля запроса из JSON или multipart/form-data."""
+        if content_type.startswith('application/json'):
+            return json.loads(body or b'{}')
+        if content_type.startswith('multipart/form-data'):
+            fields = {}
+            for name, value in re.findall(
+                    rb'name="([^"]+)"\r\n\r\n(.*?)\r\n--', body, re.S):
+                fields[name.decode()] = value.decode(errors='replace')
+            return fields
+        return {key: values[0] for key, values
+                in parse_qs(body.decode()).items()}
+
+    def _message(self, chat_id, **extra):
+        with self.lock:
+            self._message_id += 1
+            message_id = self._message_id
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id or 0), 'type': 'private'},
+            **extra,
+        }
+
+    def _deliver(self, chat_id, text):
+        now = time.time()
+        with self.lock:
+            self.messages.append((chat_id, text))
+            for lesson in self.LESSON_RE.findall(text):
+                self.deliveries.append((lesson, now))
+
+    def handle(self, request, fields):
+        method = request.path.rsplit('/', 1)[-1].split('?')[0]
+        token = request.path.split('/')[1][len('bot'):]
+        if self.valid_tokens is not None and token not in self.valid_tokens:
+            request.reply(401, {'ok': False, 'error_code': 401,
+                                'description': 'Unauthorized'})
+            return
+        if method == 'getMe':
+            request.reply(200, {'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'stand-in',
+                'username': 'stand_in_bot'}})
+            return
+        if method == 'getUpdates':
+            time.sleep(min(float(fields.get('timeout', 0) or 0), 1))
+            request.reply(200, {'ok': True, 'result': []})
+            return
+        outcome = self.behaviour.outcome()
+        if outcome == 'error':
+            request.reply(500, {'ok': False, 'error_code': 500,
+                                'description': 'Internal Server Error'})
+            return
+        if outcome == 'throttle':
+            retry_after = self.behaviour.retry_after
+            request.reply(429, {
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after '
+                               f'{retry_after}',
+                'parameters': {'retry_after': retry_after}})
+            return
+        chat_id = fields.get('chat_id')
+        if method == 'sendMessage':
+            text = fields.get('text', '')
+            self._deliver(chat_id, text)
+            result = self._message(chat_id, text=text)
+        elif method == 'sendPhoto':
+            with self.lock:
+                self.photos += 1
+            # Текст уведомления может прийти подписью к картинке.
+            if fields.get('caption'):
+                self._deliver(chat_id, fields['caption'])
+            result = self._message(chat_id, photo=[{
+                'file_id': 'stand-in-photo', 'file_unique_id': 'photo',
+                'width': 1, 'height': 1}])
+        else:
+            request.reply(404, {'ok': False, 'error_code': 404,
+                                'description': 'Not Found'})
+            return
+        request.reply(200, {'ok': True, 'result': result})
+
+
+def start(stand_in):
+    """Запуск заменителя в фоновом потоке."""
+    thread = threading.Thread(target=stand_in.server.serve_forever,
+                              daemon=True)
+    thread.start()
+    return stand_in
+
+
+def stop(stand_in):
+    """Остановка заменителя."""
+    stand_in.server.shutdown()
+    stand_in.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--practicum-port', type=int, default=8081)
+    parser.add_argument('--telegram-port', type=int, default=8082)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--change-rate', type=float, default=0.05)
+    args = parser.parse_args()
+    behaviour = Behaviour(args.latency, args.error_rate, args.throttle_rate)
+    practicum = start(FakePracticum(behaviour, args.change_rate,
+                                    port=args.practicum_port))
+    telegram = start(FakeTelegram(behaviour, port=args.telegram_port))
+    print(f'ENDPOINT={practicum.endpoint}')
+    print(f'TELEGRAM_BASE_URL={telegram.base_url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop(practicum)
+        stop(telegram)
+
+
+if __name__ == '__main__':
+    main()
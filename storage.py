@@ -0,0 +1,223 @@
+import json
+import sqlite3
+import threading
+import time
+
+import settings
+from subscriptions import StatusIndex, Subscription
+
+
+class StateStore:
+    """Хранилище состояния подписок.
+    save() только помечает подписку изменённой, запись на диск
+    происходит пачкой в flush().
+    """
+
+    def __init__(self, flush_interval=None, flush_batch=None,
+                 clock=time.monotonic):
+        self.flush_interval = (settings.STATE_FLUSH_INTERVAL
+                               if flush_interval is None else flush_interval)
+        self.flush_batch = flush_batch or settings.STATE_FLUSH_BATCH
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._dirty = {}
+        self._last_flush = clock()
+
+    @staticmethod
+    def dump(subscription):
+        """Состояние подписки в виде словаря."""
+        return {
+            'current_date': subscription.current_date,
+            'status': subscription.status,
+            'err_message': subscription.err_message,
+            'homeworks': dict(subscription.homeworks),
+            'idle_polls': subscription.idle_polls,
+            'paused': subscription.paused,
+            'polled_at': subscription.polled_at,
+        }
+
+    @staticmethod
+    def restore(subscription, state):
+        """Перенос сохранённого состояния в подписку."""
+        subscription.current_date = state['current_date']
+        subscription.status = state['status']
+        subscription.err_message = state['err_message']
+        subscription.homeworks = StatusIndex(state['homeworks'])
+        subscription.idle_polls = state.get('idle_polls', 0)
+        subscription.paused = state.get('paused', False)
+        subscription.polled_at = state.get('polled_at', 0)
+
+    def load(self, subscription):
+        """Восстановление подписки. False, если состояния нет."""
+        state = self._read(subscription.key)
+        if state is None:
+            return False
+        self.restore(subscription, state)
+        return True
+
+    def peek(self, subscription):
+        """Копия подписки с сохранённым состоянием или None.
+        Сама подписка не меняется.
+        """
+        state = self._read(subscription.key)
+        if state is None:
+            return None
+        copy = Subscription(subscription.token, subscription.chat_id)
+        self.restore(copy, state)
+        return copy
+
+    def save(self, subscription):
+        """Отложенное сохранение состояния подписки."""
+        if self.mark(subscription):
+            self.flush()
+
+    def mark(self, subscription):
+        """Пометка подписки изменённой без записи.
+        Возвращает True, если пора вызвать flush().
+        """
+        with self._lock:
+            self._dirty[subscription.key] = self.dump(subscription)
+            return (len(self._dirty) >= self.flush_batch
+                    or self.clock() - self._last_flush >= self.flush_interval)
+
+    def flush(self):
+        """Запись всех изменённых подписок одной транзакцией.
+        Если запись не удалась, подписки остаются изменёнными.
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._last_flush = self.clock()
+        if not dirty:
+            return
+        try:
+            self._write(dirty)
+        except Exception:
+            with self._lock:
+                # Сохранённое за время записи новее неудавшейся пачки.
+                dirty.update(self._dirty)
+                self._dirty = dirty
+            raise
+
+    def publish(self, subscription):
+        """Изменение подписки командой бота (новая подписка, пауза)
+        для воркера-владельца. В одном процессе публиковать некому.
+        """
+
+    def subscription_changes(self):
+        """Опубликованные с прошлого вызова изменения:
+        список (token, chat_id, paused).
+        """
+        return []
+
+    def close(self):
+        """Сброс изменений и закрытие хранилища."""
+        self.flush()
+
+    def _read(self, key):
+        raise NotImplementedError
+
+    def _write(self, states):
+        raise NotImplementedError
+
+
+class MemoryStateStore(StateStore):
+    """Хранилище в памяти (для тестов и одноразовых запусков)."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.states = {}
+
+    def _read(self, key):
+        return self.states.get(key)
+
+    def _write(self, states):
+        self.states.update(states)
+
+
+class SQLiteStateStore(StateStore):
+    """Хранилище в файле SQLite в режиме журнала WAL.
+    Через таблицу subscription_changes воркеры получают изменения,
+    сделанные командами бота в воркере 0.
+    """
+
+    def __init__(self, path=None, **kwargs):
+        super().__init__(**kwargs)
+        self.connection = sqlite3.connect(
+            path or settings.STATE_DB, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        with self._db_lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS subscription_state ('
+                'key TEXT PRIMARY KEY, state TEXT NOT NULL)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS subscription_changes ('
+                'key TEXT PRIMARY KEY, token TEXT NOT NULL, chat_id, '
+                'paused INTEGER NOT NULL, seq INTEGER NOT NULL)')
+            # Изменения до открытия уже учтены в состоянии и списке подписок.
+            self._changes_seq = self.connection.execute(
+                'SELECT COALESCE(MAX(seq), 0) FROM subscription_changes'
+            ).fetchone()[0]
+
+    def load(self, subscription):
+        """Восстановление подписки с учётом паузы, заданной командой."""
+        loaded = super().load(subscription)
+        with self._db_lock:
+            row = self.connection.execute(
+                'SELECT paused FROM subscription_changes WHERE key = ?',
+                (subscription.key,)).fetchone()
+        if row is not None:
+            subscription.paused = bool(row[0])
+        return loaded
+
+    def publish(self, subscription):
+        with self._db_lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO subscription_changes '
+                '(key, token, chat_id, paused, seq) VALUES (?, ?, ?, ?, '
+                '(SELECT COALESCE(MAX(seq), 0) + 1 '
+                'FROM subscription_changes))',
+                (subscription.key, subscription.token, subscription.chat_id,
+                 int(subscription.paused)))
+
+    def subscription_changes(self):
+        with self._db_lock:
+            rows = self.connection.execute(
+                'SELECT token, chat_id, paused, seq FROM subscription_changes '
+                'WHERE seq > ? ORDER BY seq', (self._changes_seq,)).fetchall()
+        if rows:
+            self._changes_seq = rows[-1][3]
+        return [(token, chat_id, bool(paused))
+                for token, chat_id, paused, _ in rows]
+
+    def _read(self, key):
+        with self._db_lock:
+            row = self.connection.execute(
+                'SELECT state FROM subscription_state WHERE key = ?',
+                (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, states):
+        rows = [(key, json.dumps(state, ensure_ascii=False))
+                for key, state in states.items()]
+        with self._db_lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO subscription_state (key, state) '
+                'VALUES (?, ?)', rows)
+
+    def close(self):
+        super().close()
+        with self._db_lock:
+            self.connection.close()
+
+
+BACKENDS = {
+    'sqlite': SQLiteStateStore,
+    'memory': MemoryStateStore,
+}
+
+
+def open_store(backend=None, **kwargs):
+    """Создание хранилища по имени из settings.STATE_BACKEND."""
+    return BACKENDS[backend or settings.STATE_BACKEND](**kwargs)
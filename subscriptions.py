@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from array import array
+from collections.abc import MutableMapping
+
+# Таблица кодов статусов, общая для всех подписок: код -> статус.
+STATUSES = []
+_STATUS_CODES = {}
+_STATUS_LOCK = threading.Lock()
+
+
+def status_code(status):
+    """Код статуса 0..255; новый статус добавляется в таблицу."""
+    code = _STATUS_CODES.get(status)
+    if code is not None:
+        return code
+    with _STATUS_LOCK:
+        code = _STATUS_CODES.get(status)
+        if code is None:
+            if len(STATUSES) > 255:
+                raise ValueError('Слишком много разных статусов работ')
+            STATUSES.append(sys.intern(status))
+            code = _STATUS_CODES[status] = len(STATUSES) - 1
+    return code
+
+
+def homework_id(key):
+    """Ключ работы целым числом: id или хэш названия работы без id."""
+    try:
+        return int(key)
+    except ValueError:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return -(int.from_bytes(digest, 'big') >> 1) - 1
+
+
+class StatusIndex(MutableMapping):
+    """Последний известный статус каждой работы: ключ -> статус.
+    id работ хранятся массивом int64, статусы - байтом кода из общей
+    таблицы. Работ у подписки десятки, поэтому поиск по массиву
+    занимает доли микросекунды, а памяти нужно в разы меньше словаря.
+    """
+
+    __slots__ = ('_ids', '_codes', '_names')
+
+    def __init__(self, items=()):
+        self._ids = array('q')
+        self._codes = bytearray()
+        # Названия работ без id (в ответах API они редки): хэш -> ключ.
+        self._names = None
+        self.update(items)
+
+    def _find(self, key):
+        try:
+            return self._ids.index(homework_id(key))
+        except ValueError:
+            return -1
+
+    def get(self, key, default=None):
+        index = self._find(key)
+        return default if index < 0 else STATUSES[self._codes[index]]
+
+    def __getitem__(self, key):
+        index = self._find(key)
+        if index < 0:
+            raise KeyError(key)
+        return STATUSES[self._codes[index]]
+
+    def __setitem__(self, key, status):
+        code = status_code(status)
+        index = self._find(key)
+        if index < 0:
+            homework = homework_id(key)
+            if homework < 0:
+                if self._names is None:
+                    self._names = {}
+                self._names[homework] = key
+            self._ids.append(homework)
+            self._codes.append(code)
+        else:
+            self._codes[index] = code
+
+    def __delitem__(self, key):
+        index = self._find(key)
+        if index < 0:
+            raise KeyError(key)
+        if self._names is not None:
+            self._names.pop(self._ids[index], None)
+        del self._ids[index]
+        del self._codes[index]
+
+    def __iter__(self):
+        names = self._names or {}
+        return (names.get(homework) or str(homework)
+                for homework in self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __repr__(self):
+        return f'StatusIndex({dict(self)!r})'
+
+
+class Subscription:
+    """Подписка: токен Практикума и чат, куда слать уведомления."""
+
+    __slots__ = ('token', 'chat_id', 'current_date', 'status', 'err_message',
+                 'homeworks', 'idle_polls', 'paused', 'validators',
+                 'polled_at')
+
+    def __init__(self, token, chat_id, current_date=0, status='',
+                 err_message='', homeworks=None, idle_polls=0,
+                 paused=False, polled_at=0):
+        self.token = token
+        self.chat_id = chat_id
+        self.current_date = current_date
+        self.status = status
+        self.err_message = err_message
+        # Последний известный статус каждой работы: ключ -> статус.
+        self.homeworks = StatusIndex(homeworks or ())
+        # Число опросов подряд без изменений статусов.
+        self.idle_polls = idle_polls
+        self.paused = paused
+        # ETag, Last-Modified и хэш тела последнего ответа API.
+        self.validators = None
+        # Время последнего опроса (time.time()), чтобы после перезапуска
+        # не опрашивать заново только что опрошенные подписки.
+        self.polled_at = polled_at
+
+    @property
+    def key(self):
+        """Уникальный ключ подписки."""
+        return f'{self.chat_id}:{self.token}'
+
+    def __repr__(self):
+        return f'Subscription(chat_id={self.chat_id!r})'
+
+
+class SubscriptionRegistry:
+    """Реестр подписок, обслуживаемых одним процессом."""
+
+    def __init__(self, subscriptions=()):
+        self._items = {}
+        for subscription in subscriptions:
+            self.add(subscription)
+
+    def add(self, subscription):
+        """Добавление подписки (повторная заменяет старую)."""
+        self._items[subscription.key] = subscription
+        return subscription
+
+    def remove(self, key):
+        """Удаление подписки по ключу."""
+        return self._items.pop(key, None)
+
+    def get(self, key):
+        """Поиск подписки по ключу."""
+        return self._items.get(key)
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+
+def load_subscriptions(path, default_token=None, default_chat_id=None):
+    """Загрузка подписок из JSON-файла.
+    Формат: [{"token": "...", "chat_id": 123}, ...].
+    Без файла используется пара токен/чат из переменных окружения.
+    """
+    registry = SubscriptionRegistry()
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as file:
+            for item in json.load(file):
+                registry.add(Subscription(item['token'], item['chat_id']))
+    elif default_token and default_chat_id:
+        registry.add(Subscription(default_token, default_chat_id))
+    return registry
+
+
+def save_subscriptions(path, registry):
+    """Сохранение списка подписок в JSON-файл."""
+    items = [{'token': subscription.token, 'chat_id': subscription.chat_id}
+             for subscription in registry]
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(items, file)
+    os.replace(tmp_path, path)
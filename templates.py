@@ -0,0 +1,118 @@
+import json
+import os
+
+import settings
+
+
+class Notification(str):
+    """Текст уведомления вместе с кодом статуса и картинкой.
+    Это обычная строка, поэтому её можно отправить и сравнить как раньше,
+    а картинка берётся из атрибута без поиска по тексту.
+    updated_at - время смены статуса из ответа API, traces - трассы
+    доставки (tracing.Trace): у объединённого уведомления их несколько.
+    """
+
+    def __new__(cls, text, status=None, image=None, updated_at=None):
+        notification = super().__new__(cls, text)
+        notification.status = status
+        notification.image = image
+        notification.updated_at = updated_at
+        notification.traces = []
+        return notification
+
+    @property
+    def trace(self):
+        """Первая трасса уведомления или None."""
+        return self.traces[0] if self.traces else None
+
+    @trace.setter
+    def trace(self, trace):
+        self.traces = [] if trace is None else [trace]
+
+    @classmethod
+    def join(cls, notifications, separator='\n'):
+        """Несколько уведомлений одним сообщением с картинкой первого.
+        Время смены статуса берётся самое раннее; трассы сохраняются
+        все, чтобы доставка завершила каждую из них.
+        """
+        first = notifications[0]
+        updated = [notification.updated_at for notification in notifications
+                   if getattr(notification, 'updated_at', None)]
+        joined = cls(separator.join(notifications),
+                     getattr(first, 'status', None),
+                     getattr(first, 'image', None),
+                     min(updated) if updated else None)
+        joined.traces = [trace for notification in notifications
+                         for trace in getattr(notification, 'traces', ())]
+        return joined
+
+
+class StatusTemplate:
+    """Скомпилированный шаблон сообщения для кода статуса."""
+
+    __slots__ = ('status', 'image', 'verdicts', 'compiled')
+
+    def __init__(self, status, verdicts, image=None, headers=None):
+        self.status = status
+        self.image = image
+        self.verdicts = dict(verdicts)
+        headers = headers or settings.MESSAGE_TEMPLATES
+        # Вердикт подставляется один раз; при отправке остаётся только имя.
+        self.compiled = {}
+        for locale, verdict in self.verdicts.items():
+            self.compiled[locale] = headers[locale].format(
+                homework_name='{homework_name}',
+                verdict=verdict.replace('{', '{{').replace('}', '}}'))
+
+    def render(self, homework_name, locale=None):
+        text = self.compiled[locale or settings.LOCALE].format(
+            homework_name=homework_name)
+        return Notification(text, self.status, self.image)
+
+
+class TemplateRegistry:
+    """Шаблоны уведомлений по коду статуса."""
+
+    def __init__(self, templates=()):
+        self._templates = {template.status: template
+                           for template in templates}
+
+    def images(self):
+        """Имена картинок всех статусов."""
+        return {template.image for template in self._templates.values()
+                if template.image}
+
+    def __contains__(self, status):
+        return status in self._templates
+
+    def __getitem__(self, status):
+        return self._templates[status]
+
+    def verdict(self, status, locale=None):
+        """Текст вердикта без названия работы."""
+        return self._templates[status].verdicts[locale or settings.LOCALE]
+
+    def render(self, status, homework_name, locale=None):
+        """Готовое уведомление для статуса и названия работы."""
+        return self._templates[status].render(homework_name, locale)
+
+    @classmethod
+    def from_settings(cls):
+        """Шаблоны из settings.STATUS_TEMPLATES_FILE.
+        Без файла используются settings.HOMEWORK_STATUSES на языке LOCALE.
+        """
+        path = settings.STATUS_TEMPLATES_FILE
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+            headers = data.get('messages', settings.MESSAGE_TEMPLATES)
+            return cls(
+                StatusTemplate(status, item['text'], item.get('image'),
+                               headers)
+                for status, item in data['statuses'].items())
+        return cls(
+            StatusTemplate(status, {settings.LOCALE: verdict}, status)
+            for status, verdict in settings.HOMEWORK_STATUSES.items())
+
+
+registry = TemplateRegistry.from_settings()
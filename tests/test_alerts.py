@@ -0,0 +1,45 @@
+from alerts import ErrorAggregator
+from utils import FakeClock
+
+
+class TestErrorAggregator:
+
+    def test_alternating_errors_are_reported_once(self):
+        clock = FakeClock()
+        aggregator = ErrorAggregator(600, 3600, clock=clock)
+        reported = []
+        for index in range(10):
+            clock.now = index * 60
+            error = (TimeoutError(f'timeout {index}') if index % 2
+                     else TypeError(f'ошибка {index}'))
+            reported.append(aggregator.report(1, error))
+        assert len([text for text in reported if text]) == 2, (
+            'Каждый тип ошибки должен сообщаться один раз за окно, '
+            'даже если ошибки чередуются и текст меняется'
+        )
+
+    def test_digest_counts_suppressed(self):
+        clock = FakeClock()
+        aggregator = ErrorAggregator(600, 3600, clock=clock)
+        for minute in range(0, 61, 5):
+            clock.now = minute * 60
+            aggregator.report(1, TypeError('сбой'))
+        assert aggregator.flush() == [(1, (
+            'Ошибок TypeError за последние 60 мин: 12. Последняя: сбой'))]
+        clock.now = 3600 * 2
+        assert aggregator.flush() == [], (
+            'Без новых повторов сводка не отправляется'
+        )
+        assert len(aggregator) == 0, (
+            'Прекратившиеся ошибки должны забываться'
+        )
+        assert aggregator.report(1, TypeError('сбой')), (
+            'После окна тишины ошибка сообщается снова'
+        )
+
+    def test_errors_are_per_chat(self):
+        aggregator = ErrorAggregator(600, 3600, clock=FakeClock())
+        assert aggregator.report(1, TypeError('сбой'))
+        assert aggregator.report(2, TypeError('сбой')), (
+            'Подавление не должно распространяться на другие чаты'
+        )
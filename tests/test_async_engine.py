@@ -0,0 +1,59 @@
+import asyncio
+
+from async_engine import AsyncPollEngine
+from scheduler import PollScheduler
+from subscriptions import Subscription
+
+
+class TestAsyncEngine:
+
+    def test_polls_run_concurrently(self):
+        clock = [0.0]
+        scheduler = PollScheduler(interval=600, clock=lambda: clock[0])
+        engine = AsyncPollEngine(scheduler, max_polls=2, max_sends=1,
+                                 clock=lambda: clock[0])
+        subscriptions = [Subscription(str(i), i) for i in range(3)]
+        for subscription in subscriptions:
+            scheduler.schedule(subscription, 0)
+        started = []
+
+        async def poll(engine, subscription):
+            started.append(subscription.chat_id)
+            await engine.fetch(lambda: None)
+
+        async def scenario():
+            scheduler.interval = 0.01
+            await engine.run_once(poll)
+            await engine.drain()
+
+        asyncio.run(scenario())
+        assert sorted(started) == [0, 1, 2], (
+            'Все наступившие подписки должны быть опрошены'
+        )
+        assert len(scheduler) == 3, (
+            'Подписки должны вернуться в очередь планировщика'
+        )
+
+    def test_stop_drains_within_deadline(self):
+        scheduler = PollScheduler(interval=0.002, policy=lambda s: 600)
+        engine = AsyncPollEngine(scheduler, max_polls=2, max_sends=1)
+        fast, slow = Subscription('fast', 1), Subscription('slow', 2)
+        scheduler.spread([fast, slow])
+        finished = []
+
+        async def poll(engine, subscription):
+            await asyncio.sleep(0 if subscription is fast else 10)
+            finished.append(subscription.token)
+
+        async def scenario():
+            asyncio.get_running_loop().call_later(0.05, engine.stop)
+            await engine.run(poll, drain_timeout=0.1)
+
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+        assert finished == ['fast'], (
+            'Остановка должна дождаться опросов не дольше срока'
+        )
+        assert len(scheduler) == 2, (
+            'Прерванный опрос должен вернуться в очередь'
+        )
+        assert engine.stopped_at is not None
@@ -0,0 +1,170 @@
+import json
+
+import pytest
+
+import homework
+from models import ApiResponse, Homework
+from subscriptions import Subscription
+
+
+def homeworks_from(*items):
+    return [Homework.from_dict(item) for item in items]
+
+
+class TestCollectChanges:
+
+    def test_all_transitions_are_reported(self):
+        subscription = Subscription('token', 1)
+        homeworks = homeworks_from(
+            {'id': 1, 'status': 'approved', 'lesson_name': 'Спринт 1'},
+            {'id': 2, 'status': 'rejected', 'lesson_name': 'Спринт 2'},
+        )
+        messages = homework.collect_changes(subscription, homeworks)
+        assert len(messages) == 2, (
+            'Должны быть отправлены изменения всех работ, а не только первой'
+        )
+        assert homework.collect_changes(subscription, homeworks) == [], (
+            'Неизменившиеся статусы не должны отправляться повторно'
+        )
+        homeworks[1].status = 'approved'
+        messages = homework.collect_changes(subscription, homeworks)
+        assert len(messages) == 1 and 'Спринт 2' in messages[0]
+
+    def test_invalid_homework_is_reported_separately(self, monkeypatch):
+        monkeypatch.setattr(homework, 'errors', homework.ErrorAggregator())
+        subscription = Subscription('token', 1)
+        homeworks = homeworks_from(
+            {'id': 1, 'status': 'unknown', 'lesson_name': 'Спринт 1'},
+            {'id': 2, 'status': 'approved', 'lesson_name': 'Спринт 2'},
+        )
+        messages = homework.collect_changes(subscription, homeworks)
+        assert len(messages) == 2 and 'Спринт 2' in messages[0], (
+            'Ошибка в одной работе не должна терять изменения остальных'
+        )
+        assert 'недокументированный статус' in messages[1]
+        assert subscription.homeworks == {'2': 'approved'}, (
+            'Работа с неизвестным статусом не должна попадать в состояние'
+        )
+        assert subscription.status == 'approved'
+
+    def test_handle_response_coalesces(self):
+        subscription = Subscription('token', 1)
+        response = ApiResponse.from_dict({
+            'homeworks': [
+                {'id': 1, 'status': 'approved', 'lesson_name': 'Спринт 1'},
+                {'id': 2, 'status': 'reviewing', 'lesson_name': 'Спринт 2'},
+            ],
+            'current_date': 42,
+        })
+        message = homework.handle_response(subscription, response)
+        assert message.count('Изменился статус') == 2, (
+            'Изменения за один опрос должны объединяться в одно сообщение'
+        )
+        assert subscription.current_date == 42
+
+
+class FakeResponse:
+
+    def __init__(self, body, status_code=200, headers=None):
+        self.content = body
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class TestFetchChanged:
+
+    def test_same_body_is_not_parsed(self, monkeypatch):
+        bodies = [
+            b'{"homeworks": [], "current_date": 100}',
+            b'{"homeworks": [], "current_date": 200}',
+        ]
+        sent_headers = []
+
+        def fake_get(url, headers=None, params=None, **kwargs):
+            sent_headers.append(headers)
+            return FakeResponse(bodies.pop(0), headers={'ETag': '"v1"'})
+
+        monkeypatch.setattr(homework.http_client.transport, 'get', fake_get)
+        subscription = Subscription('token', 1, current_date=1)
+        response = homework.fetch_changed(subscription)
+        assert response.homeworks == () and response.current_date == 100
+        homework.handle_response(subscription, response)
+        assert homework.fetch_changed(subscription) is None, (
+            'Совпадающий ответ не должен разбираться повторно'
+        )
+        assert subscription.current_date == 200, (
+            'current_date должен обновляться и без разбора JSON'
+        )
+        assert sent_headers[1]['If-None-Match'] == '"v1"', (
+            'Повторный запрос должен передавать ETag'
+        )
+
+    def test_failed_handling_keeps_validators(self, monkeypatch):
+        body = json.dumps({'homeworks': [
+            {'id': 1, 'status': 'approved', 'lesson_name': 'Спринт 1'},
+        ], 'current_date': 100}).encode()
+        monkeypatch.setattr(
+            homework.http_client.transport, 'get',
+            lambda *args, **kwargs: FakeResponse(
+                body, headers={'ETag': '"v1"'}))
+        subscription = Subscription('token', 1, current_date=1)
+
+        def broken(subscription, homeworks):
+            raise KeyError('status')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(homework, 'collect_changes', broken)
+            with pytest.raises(KeyError):
+                homework.handle_response(
+                    subscription, homework.fetch_changed(subscription))
+        assert subscription.validators is None, (
+            'Необработанный ответ не должен запоминаться'
+        )
+        message = homework.handle_response(
+            subscription, homework.fetch_changed(subscription))
+        assert 'Спринт 1' in message, (
+            'Тот же ответ после сбоя должен быть разобран заново'
+        )
+
+    def test_not_modified(self, monkeypatch):
+        monkeypatch.setattr(
+            homework.http_client.transport, 'get',
+            lambda *args, **kwargs: FakeResponse(b'', status_code=304))
+        subscription = Subscription('token', 1, current_date=5)
+        assert homework.fetch_changed(subscription) is None
+        assert homework.handle_response(subscription, None) is None
+        assert subscription.idle_polls == 1
+
+    def test_new_subscription_syncs_history(self, monkeypatch):
+        history = json.dumps({'homeworks': [
+            {'id': 2, 'status': 'reviewing', 'lesson_name': 'Спринт 2',
+             'date_updated': '2022-02-01T00:00:00Z'},
+            {'id': 1, 'status': 'approved', 'lesson_name': 'Спринт 1',
+             'date_updated': '2022-01-01T00:00:00Z'},
+        ], 'current_date': 300}).encode()
+        update = json.dumps({'homeworks': [
+            {'id': 2, 'status': 'approved', 'lesson_name': 'Спринт 2'},
+        ], 'current_date': 400}).encode()
+        bodies = [history, update]
+        sent_params = []
+
+        def fake_get(url, headers=None, params=None, **kwargs):
+            sent_params.append(params)
+            return FakeResponse(bodies.pop(0))
+
+        monkeypatch.setattr(homework.http_client.transport, 'get', fake_get)
+        subscription = Subscription('token', 1)
+        assert homework.fetch_changed(subscription) is None, (
+            'История работ не должна приводить к уведомлениям'
+        )
+        assert subscription.homeworks == {'1': 'approved', '2': 'reviewing'}
+        assert subscription.current_date == 300
+        assert subscription.status == 'reviewing', (
+            'Статус подписки - статус последней изменённой работы'
+        )
+        message = homework.handle_response(
+            subscription, homework.fetch_changed(subscription))
+        assert sent_params[1]['from_date'] == 300, (
+            'После загрузки истории опрос идёт с курсора current_date'
+        )
+        assert 'Спринт 2' in message and 'Спринт 1' not in message
@@ -0,0 +1,158 @@
+from types import SimpleNamespace
+
+import pytest
+
+import circuit
+import homework
+import utils
+from circuit import CircuitBreaker, CircuitOpen
+from subscriptions import Subscription
+
+
+def breaker(clock, **kwargs):
+    options = {'failure_threshold': 2, 'reset_timeout': 10,
+               'max_reset_timeout': 40, 'probes': 1}
+    options.update(kwargs)
+    return CircuitBreaker('test', clock=clock, **options)
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold_and_probes(self):
+        clock = utils.FakeClock()
+        cb = breaker(clock)
+        cb.acquire()
+        cb.failure()
+        assert cb.state == circuit.CLOSED, 'Один сбой не размыкает цепь'
+        cb.acquire()
+        cb.failure()
+        assert cb.state == circuit.OPEN
+        with pytest.raises(CircuitOpen):
+            cb.acquire()
+        assert not cb.allows()
+        clock.now = 10
+        cb.acquire()
+        assert cb.state == circuit.HALF_OPEN
+        with pytest.raises(CircuitOpen):
+            cb.acquire()
+        cb.success()
+        assert cb.state == circuit.CLOSED, (
+            'Успешная проба должна замыкать цепь'
+        )
+
+    def test_failed_probe_backs_off(self):
+        clock = utils.FakeClock()
+        cb = breaker(clock, failure_threshold=1)
+        cb.failure()
+        clock.now = 10
+        cb.acquire()
+        cb.failure()
+        assert cb.state == circuit.OPEN and cb.timeout == 20, (
+            'Неудачная проба должна удваивать паузу'
+        )
+        clock.now = 25
+        assert not cb.allows()
+        clock.now = 30
+        assert cb.allows()
+
+    def test_listeners_see_transitions(self):
+        clock = utils.FakeClock()
+        cb = breaker(clock, failure_threshold=1)
+        seen = []
+        cb.subscribe(lambda _, old, new: seen.append((old, new)))
+        cb.failure()
+        clock.now = 10
+        cb.acquire()
+        cb.success()
+        assert seen == [
+            (circuit.CLOSED, circuit.OPEN),
+            (circuit.OPEN, circuit.HALF_OPEN),
+            (circuit.HALF_OPEN, circuit.CLOSED),
+        ]
+
+    def test_abandoned_probe_is_released(self, monkeypatch):
+        clock = utils.FakeClock()
+        telegram_api = breaker(clock, failure_threshold=1)
+        monkeypatch.setattr(circuit, 'telegram_api', telegram_api)
+        monkeypatch.setattr(homework.ratelimit, 'acquire_telegram',
+                            lambda chat_id: None)
+        telegram_api.failure()
+        clock.now = 10
+
+        def broken(**kwargs):
+            raise ValueError('файл картинки не прочитан')
+
+        with pytest.raises(ValueError):
+            homework.telegram_call(broken, 1)
+        assert telegram_api.state == circuit.HALF_OPEN, (
+            'Запрос, не дошедший до Bot API, не должен замыкать цепь'
+        )
+        assert telegram_api.allows(), (
+            'Отменённая проба должна освобождать место для следующей'
+        )
+
+    def test_local_request_error_is_not_outage(self, monkeypatch):
+        clock = utils.FakeClock()
+        practicum = breaker(clock, failure_threshold=1)
+        monkeypatch.setattr(circuit, 'practicum', practicum)
+
+        def get(*args, headers=None, **kwargs):
+            headers['Authorization'].encode('latin-1')
+
+        monkeypatch.setattr(homework.http_client.transport, 'get', get)
+        with pytest.raises(UnicodeEncodeError):
+            homework.request_statuses('токен', 1)
+        assert practicum.state == circuit.CLOSED, (
+            'Ошибка запроса не должна размыкать цепь Практикума'
+        )
+        assert practicum.failures == 0
+
+
+class TestOutage:
+
+    def test_server_errors_open_circuit_once(self, monkeypatch):
+        clock = utils.FakeClock()
+        practicum = breaker(clock)
+        monkeypatch.setattr(circuit, 'practicum', practicum)
+        responses = []
+
+        def get(*args, **kwargs):
+            responses.append(1)
+            return SimpleNamespace(status_code=503, headers={},
+                                   content=b'')
+
+        monkeypatch.setattr(homework.http_client.transport, 'get', get)
+        sent = []
+        monkeypatch.setattr(homework, 'notify',
+                            lambda bot, chat_id, text: sent.append(text))
+        practicum.subscribe(
+            lambda *args: homework.report_outage('bot', 1, *args))
+        subscriptions = [Subscription(f'token-{n}', n) for n in range(5)]
+        utils.poll_async('bot', subscriptions)
+        assert len(responses) == 2, (
+            'После размыкания цепи запросы к API не должны выполняться'
+        )
+        assert sent == [homework.OUTAGE_MESSAGES[circuit.OPEN]], (
+            'Вместо ошибки в каждую подписку - одно уведомление о сбое'
+        )
+        assert all(not item.err_message for item in subscriptions)
+
+    def test_recovery_is_reported(self, monkeypatch):
+        clock = utils.FakeClock()
+        practicum = breaker(clock, failure_threshold=1)
+        sent = []
+        monkeypatch.setattr(homework, 'notify',
+                            lambda bot, chat_id, text: sent.append(text))
+        practicum.subscribe(
+            lambda *args: homework.report_outage('bot', 1, *args))
+        practicum.failure()
+        clock.now = 10
+        practicum.acquire()
+        practicum.failure()
+        clock.now = 30
+        practicum.acquire()
+        practicum.success()
+        assert sent == [homework.OUTAGE_MESSAGES[circuit.OPEN],
+                        homework.OUTAGE_MESSAGES[circuit.CLOSED]], (
+            'Неудачные пробы не должны порождать новых уведомлений'
+        )
@@ -0,0 +1,144 @@
+import time
+from types import SimpleNamespace
+
+import homework
+import settings
+from commands import CommandService
+from storage import MemoryStateStore
+from subscriptions import Subscription, SubscriptionRegistry
+
+
+class FakeUpdater:
+
+    def __init__(self, bot, service):
+        self.service = service
+        self.calls = []
+
+    def start_polling(self, **kwargs):
+        self.calls.append('start')
+
+    def stop(self):
+        self.calls.append('stop')
+
+
+class SlowUpdater(FakeUpdater):
+
+    def stop(self):
+        time.sleep(5)
+
+
+class FlushRecordingStore(MemoryStateStore):
+
+    def __init__(self):
+        super().__init__()
+        self.flushes = []
+
+    def flush(self):
+        self.flushes.append(time.monotonic())
+        super().flush()
+
+
+class TestCommandService:
+
+    def test_status_from_memory(self):
+        registry = SubscriptionRegistry([
+            Subscription('token', 1, status='approved',
+                         homeworks={'1': 'approved'}),
+        ])
+        service = CommandService(registry)
+        assert 'ревьюеру всё понравилось' in service.status_text(1), (
+            '/status должен отвечать последним известным статусом'
+        )
+        assert 'Подписок нет' in service.status_text(2)
+
+    def test_subscribe_and_pause(self):
+        registry = SubscriptionRegistry()
+        added = []
+        changes = []
+        service = CommandService(registry, on_subscribe=added.append,
+                                 on_change=changes.extend)
+        service.subscribe(5, 'token')
+        service.subscribe(5, 'token')
+        assert len(registry) == 1 and len(added) == 1, (
+            'Повторная подписка не должна создавать дубликат'
+        )
+        service.set_paused(5, True)
+        assert all(s.paused for s in registry)
+        service.set_paused(5, False)
+        assert not any(s.paused for s in registry)
+        assert len(changes) == 3
+
+    def test_subscribe_checks_token_and_limit(self, monkeypatch):
+        monkeypatch.setattr(settings, 'MAX_CHAT_SUBSCRIPTIONS', 2)
+        registry = SubscriptionRegistry()
+        service = CommandService(registry,
+                                 check_token=lambda token: token != 'bad')
+        assert 'отклонён' in service.subscribe(5, 'bad')
+        assert len(registry) == 0, 'Неверный токен не должен опрашиваться'
+        service.subscribe(5, 'first')
+        service.subscribe(5, 'second')
+        assert 'больше оформить нельзя' in service.subscribe(5, 'third')
+        assert len(registry) == 2, 'Число подписок в чате ограничено'
+
+    def test_subscribe_answers_after_deleting_token(self):
+        calls = []
+        message = SimpleNamespace(
+            delete=lambda: calls.append('delete'),
+            reply_text=lambda text: calls.append('reply'))
+        bot = SimpleNamespace(
+            send_message=lambda chat_id, text: calls.append((chat_id, text)))
+        update = SimpleNamespace(effective_message=message,
+                                 effective_chat=SimpleNamespace(id=5))
+        context = SimpleNamespace(args=['token'], bot=bot)
+        CommandService(SubscriptionRegistry()).cmd_subscribe(update, context)
+        assert calls == ['delete', (5, 'Подписка оформлена.')], (
+            'Ответ не должен ссылаться на удалённое сообщение с токеном'
+        )
+
+    def test_token_must_be_ascii(self, monkeypatch):
+        monkeypatch.setattr(homework.http_client.transport, 'get', None)
+        assert not homework.validate_token('токен'), (
+            'Токен не в ASCII отклоняется без запроса к API'
+        )
+
+
+class TestRunWithCommands:
+
+    def configure(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, 'METRICS_PORT', None)
+        monkeypatch.setattr(settings, 'RELOAD_CHECK_INTERVAL', None)
+        monkeypatch.setattr(settings, 'TRACE_FILE', None)
+        monkeypatch.setattr(settings, 'SHUTDOWN_TIMEOUT', 1)
+        monkeypatch.setattr(settings, 'OUTBOX_STOP_TIMEOUT', 1)
+        monkeypatch.setattr(settings, 'OUTBOX_FILE',
+                            str(tmp_path / 'outbox.jsonl'))
+
+    def test_run_starts_and_stops_updater(self, tmp_path, monkeypatch):
+        self.configure(tmp_path, monkeypatch)
+        updaters = []
+
+        def build_updater(bot, service):
+            updaters.append(FakeUpdater(bot, service))
+            return updaters[-1]
+
+        monkeypatch.setattr(homework.commands, 'build_updater',
+                            build_updater)
+        homework.run(object(), SubscriptionRegistry(), MemoryStateStore(),
+                     serve_commands=True, duration=0.2)
+        assert len(updaters) == 1, 'Команды бота должны обслуживаться'
+        assert updaters[0].calls == ['start', 'stop']
+        assert isinstance(updaters[0].service, CommandService)
+
+    def test_shutdown_fits_deadline(self, tmp_path, monkeypatch):
+        self.configure(tmp_path, monkeypatch)
+        monkeypatch.setattr(homework.commands, 'build_updater', SlowUpdater)
+        store = FlushRecordingStore()
+        started = time.monotonic()
+        homework.run(object(), SubscriptionRegistry(), store,
+                     serve_commands=True, duration=0.2)
+        assert time.monotonic() - started < 3, (
+            'Зависшая остановка не должна выходить за SHUTDOWN_TIMEOUT'
+        )
+        assert store.flushes and store.flushes[0] - started < 1, (
+            'Состояние сохраняется сразу после остановки опроса'
+        )
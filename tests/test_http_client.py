@@ -0,0 +1,55 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"homeworks": [], "current_date": 1}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpClient:
+
+    def test_session_reuses_connections(self, local_server):
+        session = http_client.build_session()
+        before = http_client.connection_stats()
+        for _ in range(5):
+            response = session.get(local_server,
+                                   timeout=http_client.timeout())
+            assert response.status_code == 200
+        after = http_client.connection_stats()
+        assert after['requests'] - before['requests'] == 5
+        assert after['connections'] - before['connections'] == 1, (
+            'Сессия должна переиспользовать keep-alive соединение'
+        )
+        session.close()
+
+    def test_jitter_retry_backoff(self):
+        retry = http_client.JitterRetry(total=3, backoff_factor=1)
+        retry = retry.increment('GET', '/').increment('GET', '/')
+        assert 2 <= retry.get_backoff_time() <= 2.5, (
+            'Задержка должна расти экспоненциально с добавкой jitter'
+        )
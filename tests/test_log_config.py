@@ -0,0 +1,42 @@
+import io
+import json
+import logging
+
+from log_config import JsonFormatter, SamplingFilter, setup_logging, \
+    shutdown_logging
+
+
+class TestLogging:
+
+    def test_json_record(self):
+        record = logging.LogRecord('homework', logging.INFO, __file__, 1,
+                                   'Отправка сообщения: %s', ('текст',),
+                                   None)
+        record.chat_id = 42
+        data = json.loads(JsonFormatter().format(record))
+        assert data['message'] == 'Отправка сообщения: текст'
+        assert data['chat_id'] == 42, (
+            'В запись должен попадать идентификатор подписки'
+        )
+
+    def test_debug_sampling(self):
+        sampling = SamplingFilter(every=10)
+        passed = [
+            sampling.filter(logging.LogRecord(
+                'homework', logging.DEBUG, __file__, 1,
+                'Статус работ не изменился', (), None))
+            for _ in range(25)
+        ]
+        assert sum(passed) == 3, (
+            'Повторяющиеся DEBUG-сообщения должны прореживаться'
+        )
+
+    def test_queue_pipeline(self):
+        stream = io.StringIO()
+        setup_logging('INFO', 'json', stream)
+        try:
+            logging.getLogger('homework').info('Загружено подписок: %d', 3)
+        finally:
+            shutdown_logging()
+        record = json.loads(stream.getvalue().splitlines()[-1])
+        assert record['message'] == 'Загружено подписок: 3'
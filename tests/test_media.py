@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+
+import telegram
+
+import homework
+import settings
+from media import PhotoCache
+
+
+class PhotoBot:
+
+    def __init__(self, token):
+        self.token = token
+        self.sent = []
+        self.captions = []
+        self.messages = []
+
+    def send_message(self, chat_id, text):
+        self.messages.append(text)
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        self.sent.append(photo)
+        self.captions.append(kwargs.get('caption'))
+        size = SimpleNamespace(file_id=f'id-{len(self.sent)}')
+        return SimpleNamespace(photo=[size])
+
+
+class FloodBot(PhotoBot):
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        data = photo.read()
+        if not self.sent:
+            self.sent.append(data)
+            raise telegram.error.RetryAfter(0)
+        return super().send_photo(chat_id, data, **kwargs)
+
+
+class TestPhotoCache:
+
+    def test_file_id_reused_after_upload(self, tmp_path):
+        (tmp_path / 'approved.jpg').write_bytes(b'jpeg')
+        cache_file = str(tmp_path / 'cache.json')
+        cache = PhotoCache(cache_file, str(tmp_path))
+        bot = PhotoBot('1:a')
+
+        first = cache.photo(bot, 'approved')
+        assert first.read() == b'jpeg', (
+            'Первая отправка должна загружать байты картинки'
+        )
+        cache.remember(bot, 'approved', bot.send_photo(1, first))
+        assert cache.photo(bot, 'approved') == 'id-1', (
+            'После загрузки должен отправляться file_id'
+        )
+        restored = PhotoCache(cache_file, str(tmp_path))
+        assert restored.photo(bot, 'approved') == 'id-1', (
+            'file_id должен сохраняться между перезапусками'
+        )
+
+    def test_failed_cache_write_is_not_raised(self, tmp_path):
+        (tmp_path / 'approved.jpg').write_bytes(b'jpeg')
+        cache = PhotoCache(str(tmp_path / 'missing' / 'cache.json'),
+                           str(tmp_path))
+        bot = PhotoBot('1:a')
+        cache.remember(bot, 'approved', bot.send_photo(1, b''))
+        assert cache.photo(bot, 'approved') == 'id-1', (
+            'Ошибка записи кэша не должна срывать уже сделанную отправку'
+        )
+
+    def test_file_id_is_per_bot(self, tmp_path):
+        (tmp_path / 'approved.jpg').write_bytes(b'jpeg')
+        cache = PhotoCache(str(tmp_path / 'cache.json'), str(tmp_path))
+        bot = PhotoBot('1:a')
+        cache.remember(bot, 'approved', bot.send_photo(1, b''))
+        other = cache.photo(PhotoBot('2:b'), 'approved')
+        assert not isinstance(other, str), (
+            'file_id одного бота не должен использоваться другим ботом'
+        )
+
+
+class TestDeliver:
+
+    def test_text_goes_as_caption(self, monkeypatch, tmp_path):
+        (tmp_path / 'approved.jpg').write_bytes(b'jpeg')
+        monkeypatch.setattr(homework, 'photos', PhotoCache(
+            str(tmp_path / 'cache.json'), str(tmp_path)))
+        monkeypatch.setattr(homework.ratelimit, 'acquire_telegram',
+                            lambda chat_id: None)
+        bot = PhotoBot('1:a')
+        homework.deliver(bot, 1, 'Работа проверена', 'approved')
+        assert bot.messages == [] and bot.captions == ['Работа проверена'], (
+            'Текст и картинка должны уходить одним запросом'
+        )
+        text = 'x' * (settings.TELEGRAM_CAPTION_MAX_LENGTH + 1)
+        homework.deliver(bot, 1, text, 'approved')
+        assert bot.messages == [text] and bot.captions[-1] is None, (
+            'Длинный текст не помещается в подпись и уходит сообщением'
+        )
+
+    def test_retry_after_resends_whole_photo(self, monkeypatch, tmp_path):
+        (tmp_path / 'approved.jpg').write_bytes(b'jpeg')
+        monkeypatch.setattr(homework, 'photos', PhotoCache(
+            str(tmp_path / 'cache.json'), str(tmp_path)))
+        monkeypatch.setattr(homework.ratelimit, 'acquire_telegram',
+                            lambda chat_id: None)
+        bot = FloodBot('1:a')
+        homework.send_photo(bot, 1, 'approved')
+        assert bot.sent == [b'jpeg', b'jpeg'], (
+            'Повтор после RetryAfter должен отправлять картинку целиком'
+        )
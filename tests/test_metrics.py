@@ -0,0 +1,36 @@
+import urllib.request
+
+from metrics import Registry, serve
+
+
+class TestMetrics:
+
+    def test_render_prometheus_text(self):
+        registry = Registry()
+        counter = registry.counter('polls_total', 'Опросы.', ['code'])
+        counter.inc(code=200)
+        counter.inc(code=200)
+        histogram = registry.histogram('latency_seconds', 'Задержка.',
+                                       buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        text = registry.render()
+        assert 'polls_total{code="200"} 2' in text
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 2' in text, (
+            'Корзины гистограммы должны быть накопительными'
+        )
+        assert 'latency_seconds_count 2' in text
+
+    def test_metrics_endpoint(self):
+        server = serve(port=0, host='127.0.0.1')
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/metrics'
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert 'homework_polls_total' in body, (
+            'Метрики опроса должны отдаваться по /metrics'
+        )
@@ -0,0 +1,29 @@
+import pytest
+
+from models import ApiResponse
+
+
+class TestModels:
+
+    def test_single_pass_validation(self):
+        response = ApiResponse.from_bytes(
+            b'{"homeworks": [{"id": 7, "status": "approved", '
+            b'"lesson_name": "Sprint", "reviewer_comment": "ok"}], '
+            b'"current_date": 10}')
+        homework = response.homeworks[0]
+        assert (homework.key, homework.status) == ('7', 'approved')
+        assert response.current_date == 10
+        assert not hasattr(homework, '__dict__'), (
+            'Модели должны использовать __slots__'
+        )
+
+    @pytest.mark.parametrize('body, error', [
+        (b'[]', TypeError),
+        (b'{"current_date": 1}', KeyError),
+        (b'{"homeworks": {}}', TypeError),
+        (b'{"homeworks": [{"lesson_name": "x"}]}', KeyError),
+        (b'{"homeworks": [{"status": "approved"}]}', KeyError),
+    ])
+    def test_invalid_responses(self, body, error):
+        with pytest.raises(error):
+            ApiResponse.from_bytes(body)
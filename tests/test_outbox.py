@@ -0,0 +1,96 @@
+import time
+
+from outbox import Outbox, OutboxSender
+
+
+class TestOutbox:
+
+    def test_pending_messages_survive_restart(self, tmp_path):
+        path = str(tmp_path / 'outbox.jsonl')
+        outbox = Outbox(path)
+        first = outbox.put(1, 'первое')
+        outbox.put(1, 'второе')
+        outbox.ack(outbox.take(timeout=0))
+        outbox.close()
+
+        restored = Outbox(path)
+        assert len(restored) == 1, (
+            'Недоставленные сообщения должны восстанавливаться из журнала'
+        )
+        entry = restored.take(timeout=0)
+        assert entry.text == 'второе'
+        assert entry.id > first.id
+        restored.close()
+
+    def test_chat_order_and_retry(self, tmp_path):
+        now = [0.0]
+        outbox = Outbox(str(tmp_path / 'outbox.jsonl'),
+                        clock=lambda: now[0])
+        outbox.put(1, 'a')
+        outbox.put(1, 'b')
+        outbox.put(2, 'c')
+        entry = outbox.take(timeout=0)
+        assert entry.text == 'a'
+        outbox.retry(entry, delay=10)
+        assert outbox.take(timeout=0).text == 'c', (
+            'Пока сообщение чата ждёт повтора, другие чаты не блокируются'
+        )
+        assert outbox.take(timeout=0) is None, (
+            'Следующее сообщение чата не должно обгонять повторяемое'
+        )
+        now[0] = 10
+        assert outbox.take(timeout=0).text == 'a'
+        outbox.close()
+
+    def test_sender_retries_until_delivered(self, tmp_path):
+        outbox = Outbox(str(tmp_path / 'outbox.jsonl'))
+        delivered = []
+        failures = [RuntimeError('нет сети')]
+
+        def deliver(chat_id, text, image):
+            if failures:
+                raise failures.pop()
+            delivered.append(text)
+
+        sender = OutboxSender(outbox, deliver, workers=1)
+        sender.backoff = lambda attempts: 0
+        outbox.put(1, 'текст')
+        sender.start()
+        for _ in range(200):
+            if delivered:
+                break
+            time.sleep(0.01)
+        sender.stop(timeout=2)
+        assert delivered == ['текст'], (
+            'Сообщение должно быть доставлено после ошибки отправки'
+        )
+        assert len(outbox) == 0
+        outbox.close()
+
+    def test_chat_messages_are_coalesced(self, tmp_path):
+        now = [0.0]
+        outbox = Outbox(str(tmp_path / 'outbox.jsonl'),
+                        clock=lambda: now[0], coalesce_window=1)
+        outbox.put(1, 'a', 'approved')
+        outbox.put(2, 'c')
+        outbox.put(1, 'b', 'rejected')
+        assert outbox.take(timeout=0) is None, (
+            'Первое сообщение чата ждёт окна объединения'
+        )
+        now[0] = 1
+        sent = []
+        sender = OutboxSender(
+            outbox, lambda chat_id, text, image: sent.append((text, image)),
+            coalesce='\n'.join)
+        entry = outbox.take(timeout=0)
+        entries = sender.batch(entry)
+        sender._send(entries)
+        outbox.ack(*entries)
+        assert sent == [('a\nb', 'approved')], (
+            'Сообщения одного чата должны уходить одной отправкой'
+        )
+        assert outbox.take(timeout=0).text == 'c'
+        outbox.close()
+        assert len(Outbox(str(tmp_path / 'outbox.jsonl'))) == 1, (
+            'Объединённые сообщения должны считаться доставленными'
+        )
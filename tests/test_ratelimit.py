@@ -0,0 +1,68 @@
+import pytest
+import telegram
+
+import homework
+import settings
+from ratelimit import KeyedLimiter, RateLimitExceeded, TokenBucket
+from utils import FakeClock
+
+
+class FloodBot:
+
+    def __init__(self):
+        self.calls = []
+
+    def send_message(self, chat_id, text):
+        self.calls.append((chat_id, text))
+        if len(self.calls) == 1:
+            raise telegram.error.RetryAfter(0)
+
+
+class TestTokenBucket:
+
+    def test_waits_for_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, 2, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        bucket.acquire()
+        assert clock.now == 0, 'Всплеск в пределах ёмкости не ждёт'
+        bucket.acquire()
+        assert clock.now == pytest.approx(0.5), (
+            'При исчерпании лимита вызов должен ждать, а не отказывать'
+        )
+        assert bucket.stats['throttled'] == 1
+
+    def test_max_wait_drops(self):
+        clock = FakeClock()
+        bucket = TokenBucket(1, 1, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        with pytest.raises(RateLimitExceeded):
+            bucket.acquire(max_wait=0.1)
+        assert bucket.stats['dropped'] == 1
+        clock.now = 1
+        bucket.acquire(max_wait=0.1)
+        assert clock.now == 1, 'Отменённый вызов не должен занимать токен'
+
+    def test_keyed_limiter_is_per_key(self):
+        clock = FakeClock()
+        limiter = KeyedLimiter(1, 1, max_keys=2, clock=clock,
+                               sleep=clock.sleep)
+        limiter.acquire(1)
+        limiter.acquire(2)
+        assert clock.now == 0, 'Лимиты разных чатов независимы'
+        limiter.acquire(3)
+        assert len(limiter._buckets) == 2
+
+
+class TestTelegramCall:
+
+    def test_notify_retries_after_flood_control(self, monkeypatch):
+        monkeypatch.setattr(homework.outbox, 'queue', None)
+        monkeypatch.setattr(homework.ratelimit, 'acquire_telegram',
+                            lambda chat_id: None)
+        monkeypatch.setattr(settings, 'TELEGRAM_RETRY_AFTER_ATTEMPTS', 1)
+        bot = FloodBot()
+        homework.notify(bot, 5, 'Работа проверена')
+        assert bot.calls == [(5, 'Работа проверена')] * 2, (
+            'После RetryAfter сообщение должно отправляться повторно'
+        )
@@ -0,0 +1,86 @@
+import json
+
+import homework
+import settings
+import templates
+from async_engine import AsyncPollEngine
+from scheduler import PollScheduler
+from storage import MemoryStateStore
+from subscriptions import Subscription, SubscriptionRegistry
+from watcher import FileWatcher
+
+
+class TestReload:
+
+    def test_watcher_reports_changes(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        calls = []
+        watcher = FileWatcher([str(path)], lambda: calls.append(1),
+                              interval=60)
+        assert not watcher.check()
+        path.write_text('[]')
+        assert watcher.check(), 'Появление файла должно замечаться'
+        assert not watcher.check()
+        assert calls == [1]
+
+    def test_reload_updates_subscriptions(self, tmp_path, monkeypatch):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text(json.dumps([
+            {'token': 'kept', 'chat_id': 1},
+            {'token': 'added', 'chat_id': 2},
+        ]))
+        monkeypatch.setattr(homework, 'SUBSCRIPTIONS_FILE', str(path))
+        monkeypatch.setattr(templates, 'registry', templates.registry)
+        monkeypatch.setattr(settings, 'RETRY_TIME', 1)
+        kept = Subscription('kept', 1, current_date=42)
+        removed = Subscription('removed', 3)
+        registry = SubscriptionRegistry([kept, removed])
+        engine = AsyncPollEngine(PollScheduler(interval=600))
+        engine.scheduler.spread(registry)
+        homework.reload_config(engine, registry, MemoryStateStore())
+        assert sorted(s.token for s in registry) == ['added', 'kept']
+        assert registry.get(kept.key) is kept, (
+            'Состояние оставшихся подписок должно сохраняться'
+        )
+        assert engine.scheduler.interval == settings.RETRY_TIME != 1, (
+            'Интервал опроса должен браться из перечитанных settings'
+        )
+        polled = [s.token for _, s in engine.scheduler.pop_due(10 ** 12)]
+        assert sorted(polled) == ['added', 'kept'], (
+            'Удалённая подписка не должна больше опрашиваться'
+        )
+
+
+class TestHistorySync:
+
+    def write_subscriptions(self, tmp_path, monkeypatch):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text(json.dumps([{'token': 'new', 'chat_id': 1}]))
+        monkeypatch.setattr(homework, 'SUBSCRIPTIONS_FILE', str(path))
+        monkeypatch.setattr(settings, 'SYNC_HISTORY', True)
+
+    def test_reload_leaves_new_subscription_for_sync(self, tmp_path,
+                                                     monkeypatch):
+        self.write_subscriptions(tmp_path, monkeypatch)
+        monkeypatch.setattr(templates, 'registry', templates.registry)
+        registry = SubscriptionRegistry()
+        engine = AsyncPollEngine(PollScheduler(interval=600))
+        homework.reload_config(engine, registry, MemoryStateStore())
+        assert [s.current_date for s in registry] == [0], (
+            'Новая подписка должна сначала загрузить историю работ'
+        )
+
+    def test_worker_leaves_new_subscription_for_sync(self, tmp_path,
+                                                     monkeypatch):
+        self.write_subscriptions(tmp_path, monkeypatch)
+        started = []
+        monkeypatch.setattr(homework, 'make_bot', lambda token: object())
+        monkeypatch.setattr(homework.http_client, 'install', lambda: None)
+        monkeypatch.setattr(homework.photos, 'preload', lambda names: None)
+        monkeypatch.setattr(homework, 'open_store', MemoryStateStore)
+        monkeypatch.setattr(homework, 'run', lambda bot, registry, store,
+                            **kwargs: started.extend(registry))
+        homework.serve_worker()
+        assert [s.current_date for s in started] == [0], (
+            'Без сохранённого состояния current_date не должен быть «сейчас»'
+        )
@@ -0,0 +1,109 @@
+from scheduler import AdaptiveInterval, PollScheduler
+from subscriptions import Subscription, SubscriptionRegistry
+from utils import FakeClock
+
+
+class TestScheduler:
+
+    def test_registry_replaces_duplicates(self):
+        registry = SubscriptionRegistry([
+            Subscription('token', 1), Subscription('token', 1),
+            Subscription('token', 2),
+        ])
+        assert len(registry) == 2, (
+            'Подписка с тем же токеном и чатом должна заменять старую'
+        )
+
+    def test_spread_is_even(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(interval=600, clock=clock,
+                                  sleep=clock.sleep)
+        subscriptions = [Subscription(str(i), i) for i in range(4)]
+        scheduler.spread(subscriptions)
+        due = [when for when, _ in scheduler.pop_due(600)]
+        assert due == [0, 150, 300, 450], (
+            'Опросы должны быть равномерно распределены по интервалу'
+        )
+
+    def test_run_once_polls_and_reschedules(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(interval=600, clock=clock,
+                                  sleep=clock.sleep)
+        polled = []
+        scheduler.spread([Subscription('a', 1), Subscription('b', 2)])
+        scheduler.run_once(polled.append)
+        assert [s.chat_id for s in polled] == [1], (
+            'За шаг должны опрашиваться только наступившие подписки'
+        )
+        assert clock.now == 300, (
+            'Планировщик должен спать до ближайшего опроса'
+        )
+        scheduler.run_once(polled.append)
+        assert [s.chat_id for s in polled] == [1, 2]
+        assert len(scheduler) == 2, (
+            'Опрошенные подписки должны возвращаться в очередь'
+        )
+
+    def test_adaptive_interval(self):
+        policy = AdaptiveInterval(
+            base=600, min_interval=60, max_interval=3600, backoff=2,
+            jitter=0, fast_statuses=('reviewing',), fast_interval=120)
+        subscription = Subscription('token', 1, status='reviewing')
+        assert policy(subscription) == 120, (
+            'Работы на проверке должны опрашиваться чаще'
+        )
+        subscription.status = 'approved'
+        assert policy(subscription) == 600
+        subscription.idle_polls = 2
+        assert policy(subscription) == 2400, (
+            'Без изменений интервал должен расти экспоненциально'
+        )
+        subscription.idle_polls = 100
+        assert policy(subscription) == 3600, (
+            'Интервал не должен превышать верхнюю границу'
+        )
+        subscription.homeworks = {'1': 'approved', '2': 'reviewing'}
+        assert policy(subscription) == 120, (
+            'Работа на проверке ускоряет опрос, даже если менялась не она'
+        )
+
+    def test_adaptive_reschedule(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(interval=600, clock=clock,
+                                  sleep=clock.sleep, policy=lambda s: 42)
+        scheduler.reschedule(Subscription('a', 1), when=0, now=10)
+        assert scheduler.next_due() == 52
+
+    def test_restore_keeps_phase_after_restart(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(interval=600, clock=clock,
+                                  sleep=clock.sleep)
+        recent = Subscription('recent', 1, polled_at=1000)
+        overdue = Subscription('overdue', 2, polled_at=100)
+        new = Subscription('new', 3)
+        scheduler.restore([recent, overdue, new], wall_now=1200)
+        due = {subscription.token: when
+               for when, subscription in scheduler.pop_due(600)}
+        assert due['recent'] == 400, (
+            'Недавно опрошенная подписка не должна опрашиваться '
+            'сразу после перезапуска'
+        )
+        assert sorted([due['overdue'], due['new']]) == [0, 300], (
+            'Просроченные и новые подписки распределяются по интервалу'
+        )
+
+    def test_removed_subscription_is_not_polled(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(interval=600, clock=clock,
+                                  sleep=clock.sleep)
+        kept, removed, in_flight = (Subscription(str(i), i)
+                                    for i in range(3))
+        scheduler.schedule(kept, 0)
+        scheduler.schedule(removed, 0)
+        scheduler.remove(removed)
+        scheduler.remove(in_flight)
+        assert [s for _, s in scheduler.pop_due(0)] == [kept]
+        scheduler.reschedule(in_flight, 0, 0)
+        assert scheduler.next_due() is None, (
+            'Снятая во время опроса подписка не должна возвращаться'
+        )
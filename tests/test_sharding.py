@@ -0,0 +1,189 @@
+import asyncio
+import functools
+import os
+import subprocess
+import sys
+
+import homework
+import ratelimit
+import settings
+from async_engine import AsyncPollEngine
+from commands import CommandService
+from scheduler import AdaptiveInterval, PollScheduler
+from sharding import HashRing, Membership, Shard
+from storage import MemoryStateStore, SQLiteStateStore
+from subscriptions import Subscription, SubscriptionRegistry
+from utils import FakeClock
+
+
+class TestHashRing:
+
+    def test_keys_are_balanced_and_move_minimally(self):
+        keys = [f'{chat}:token-{chat}' for chat in range(3000)]
+        ring = HashRing(['a', 'b', 'c'], replicas=64)
+        before = {key: ring.owner(key) for key in keys}
+        counts = [list(before.values()).count(node) for node in 'abc']
+        assert min(counts) > 600, (
+            'Подписки должны делиться между воркерами примерно поровну'
+        )
+        ring.add('d')
+        moved = [key for key in keys if ring.owner(key) != before[key]]
+        assert all(ring.owner(key) == 'd' for key in moved), (
+            'При добавлении воркера подписки переходят только к нему'
+        )
+        assert len(moved) < len(keys) / 2
+
+
+class TestMembership:
+
+    def test_heartbeats_define_workers(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        clock = FakeClock()
+        first = Membership('a', path, timeout=30, clock=clock)
+        second = Membership('b', path, timeout=30, clock=clock)
+        first.heartbeat()
+        assert second.heartbeat() == ['a', 'b']
+        clock.now = 40
+        assert second.heartbeat() == ['b'], (
+            'Воркер без сердцебиения должен выбывать из состава'
+        )
+        second.leave()
+        assert first.heartbeat() == ['a']
+        first.leave()
+
+
+class TestShard:
+
+    def test_handoff_waits_and_reloads_state(self):
+        clock = FakeClock()
+        store = MemoryStateStore()
+        shard = Shard('a', handoff_delay=60, clock=clock)
+        subscription = Subscription('token', 1, current_date=1)
+        store.save(Subscription('token', 1, current_date=99))
+        store.flush()
+        assert not shard.claim(subscription, store), (
+            'Сразу после смены состава подписка не опрашивается'
+        )
+        clock.now = 60
+        assert shard.claim(subscription, store)
+        assert subscription.current_date == 99, (
+            'Новый владелец должен взять состояние из общего хранилища'
+        )
+        shard.update(['a', 'b'])
+        owned = [Subscription(f'token-{n}', n) for n in range(50)]
+        assert 0 < sum(shard.owns(item) for item in owned) < 50, (
+            'После прихода воркера часть подписок должна уйти к нему'
+        )
+
+    def test_skipped_poll_keeps_policy_interval(self):
+        clock = FakeClock()
+        store = MemoryStateStore()
+        shard = Shard('a', handoff_delay=60, clock=clock)
+        engine = AsyncPollEngine(
+            PollScheduler(policy=AdaptiveInterval(), clock=clock),
+            clock=clock)
+        subscriptions = [Subscription(f'token-{n}', n, idle_polls=12)
+                         for n in range(20)]
+        registry = SubscriptionRegistry(subscriptions)
+        poll = functools.partial(homework.poll_subscription_async, None,
+                                 store, shard=shard)
+
+        async def scenario():
+            shard.update(['a', 'b'])
+            for subscription in subscriptions:
+                engine.add(subscription)
+            await engine.run_once(poll)
+            await asyncio.sleep(0)
+            owned = [subscription for subscription in subscriptions
+                     if shard.owns(subscription)]
+            assert len(engine.scheduler) == len(owned)
+            assert engine.scheduler.next_due() == 60, (
+                'Своя подписка ждёт конца передачи, а не интервала политики'
+            )
+            shard.update(['a'])
+            homework.sync_shard(engine, registry, store, shard)
+            await asyncio.sleep(0)
+            assert len(engine.scheduler) == len(subscriptions), (
+                'Перешедшие подписки должны вернуться в очередь'
+            )
+
+        asyncio.run(scenario())
+
+    def test_worker_teardown_survives_second_sigterm(self):
+        code = ('import os, signal, homework; '
+                'homework.ignore_stop_signals(); '
+                'os.kill(os.getpid(), signal.SIGTERM); print("ok")')
+        result = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True,
+            timeout=60, cwd=os.path.dirname(homework.__file__))
+        assert result.stdout.strip() == 'ok', (
+            'Повторный SIGTERM не должен обрывать завершение воркера'
+        )
+
+
+class TestCommandChanges:
+
+    def test_owner_receives_pause_and_new_subscription(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        commands_store = SQLiteStateStore(path, flush_interval=0)
+        owner_store = SQLiteStateStore(path, flush_interval=0)
+        paused = Subscription('token', 1, paused=True)
+        commands_store.publish(paused)
+        commands_store.publish(Subscription('new', 2))
+        assert owner_store.subscription_changes() == [
+            ('token', 1, True), ('new', 2, False)], (
+            'Воркер-владелец должен получать изменения команд'
+        )
+        assert owner_store.subscription_changes() == []
+        restored = Subscription('token', 1)
+        owner_store.load(restored)
+        assert restored.paused, (
+            'Пауза из команды должна учитываться при передаче подписки'
+        )
+        commands_store.close()
+        owner_store.close()
+
+    def test_commands_save_only_owned_state(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(homework, 'SUBSCRIPTIONS_FILE',
+                            str(tmp_path / 'subscriptions.json'))
+        store = MemoryStateStore(flush_interval=0)
+        published = []
+        monkeypatch.setattr(store, 'publish', published.append)
+        shard = Shard('a', handoff_delay=0)
+        shard.update(['a', 'b'])
+        registry = SubscriptionRegistry(
+            Subscription(f'token-{index}', index) for index in range(20))
+        changed = list(registry)
+        homework.save_registry(registry, store, changed, shard=shard)
+        assert published == changed
+        assert sorted(store.states) == sorted(
+            subscription.key for subscription in changed
+            if shard.owns(subscription)), (
+            'Чужие подписки не должны затирать состояние владельца'
+        )
+
+    def test_status_reads_state_of_other_workers(self):
+        store = MemoryStateStore(flush_interval=0)
+        shard = Shard('a', handoff_delay=0)
+        shard.update(['a', 'b'])
+        subscription = next(
+            Subscription(f'token-{index}', 1) for index in range(50)
+            if not shard.owns(Subscription(f'token-{index}', 1)))
+        store.save(Subscription(subscription.token, 1, status='approved',
+                                homeworks={'1': 'approved'}))
+        service = CommandService(
+            SubscriptionRegistry([subscription]),
+            current=functools.partial(homework.current_state, store, shard))
+        assert 'ревьюеру всё понравилось' in service.status_text(1), (
+            '/status должен брать состояние чужой подписки из хранилища'
+        )
+
+    def test_rate_limits_are_split(self, monkeypatch):
+        monkeypatch.setattr(ratelimit, 'practicum', ratelimit.practicum)
+        monkeypatch.setattr(ratelimit, 'telegram_global',
+                            ratelimit.telegram_global)
+        ratelimit.configure(3)
+        assert ratelimit.telegram_global.rate == \
+            settings.TELEGRAM_RATE_LIMIT / 3, (
+                'Общий лимит Telegram должен делиться между воркерами'
+            )
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+
+import telegram
+from telegram.utils.request import Request
+
+import homework
+import settings
+import stand_in
+from models import ApiResponse
+from subscriptions import Subscription
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestStandIn:
+
+    def test_practicum_stand_in_serves_statuses(self, monkeypatch):
+        practicum = stand_in.start(stand_in.FakePracticum(change_rate=1))
+        try:
+            monkeypatch.setattr(settings, 'ENDPOINT', practicum.endpoint)
+            subscription = Subscription('token', 1, current_date=1)
+            response = homework.fetch_changed(subscription)
+        finally:
+            stand_in.stop(practicum)
+        assert isinstance(response, ApiResponse), (
+            'Заменитель должен отдавать ответ в формате API Практикума'
+        )
+        assert response.homeworks[0].lesson_name == 'hw-1', (
+            'В ответе должна быть работа подписки'
+        )
+        assert practicum.requests == 1, (
+            'Заменитель должен считать запросы'
+        )
+
+    def test_telegram_stand_in_records_delivery(self, monkeypatch):
+        fake = stand_in.start(stand_in.FakeTelegram())
+        try:
+            bot = telegram.Bot('123:stand-in', base_url=fake.base_url,
+                               request=Request(con_pool_size=2))
+            homework.deliver(bot, 7, 'Изменился статус проверки работы '
+                                     '"hw-3". Работа проверена')
+        finally:
+            stand_in.stop(fake)
+        assert fake.messages and fake.messages[0][0] in (7, '7'), (
+            'Сообщение должно дойти до заменителя Telegram'
+        )
+        assert [lesson for lesson, _ in fake.deliveries] == ['hw-3'], (
+            'Доставка должна учитываться для подсчёта задержки'
+        )
+
+
+class TestStartup:
+
+    def test_import_is_lazy(self):
+        code = ('import homework, lazy; print([name for name in '
+                '("telegram", "telegram.ext", "requests", "dotenv", '
+                '"asyncio") if lazy.is_loaded(name)])')
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == '[]', (
+            'Импорт homework не должен загружать клиентов Telegram и HTTP'
+        )
+
+    def test_preflight_rejects_bad_tokens(self, monkeypatch):
+        practicum = stand_in.start(stand_in.FakePracticum(
+            valid_tokens={'good'}))
+        fake = stand_in.start(stand_in.FakeTelegram(
+            valid_tokens={'123:good'}))
+        try:
+            monkeypatch.setattr(settings, 'ENDPOINT', practicum.endpoint)
+            monkeypatch.setattr(settings, 'TELEGRAM_BASE_URL',
+                                fake.base_url)
+            monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'good')
+            monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '123:good')
+            assert homework.preflight(timeout=5) == []
+            monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'bad')
+            monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '123:bad')
+            problems = homework.preflight(timeout=5)
+        finally:
+            stand_in.stop(practicum)
+            stand_in.stop(fake)
+        assert len(problems) == 2, (
+            'Отклонённые токены должны обнаруживаться при запуске'
+        )
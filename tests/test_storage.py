@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from storage import MemoryStateStore, SQLiteStateStore
+from subscriptions import STATUSES, StatusIndex, Subscription
+
+
+class TestStateStore:
+
+    def test_sqlite_roundtrip(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = SQLiteStateStore(path, flush_interval=3600)
+        subscription = Subscription('token', 1, current_date=100,
+                                    status='approved',
+                                    homeworks={'7': 'approved'})
+        store.save(subscription)
+        store.close()
+
+        restored = Subscription('token', 1)
+        store = SQLiteStateStore(path)
+        assert store.load(restored), (
+            'Состояние подписки должно восстанавливаться после перезапуска'
+        )
+        assert restored.current_date == 100
+        assert restored.homeworks == {'7': 'approved'}
+        assert not store.load(Subscription('other', 2))
+        store.close()
+
+    def test_save_is_batched(self):
+        store = MemoryStateStore(flush_interval=3600, flush_batch=2)
+        store.save(Subscription('a', 1))
+        assert store.states == {}, (
+            'Сохранение не должно писаться на диск при каждом опросе'
+        )
+        store.save(Subscription('b', 2))
+        assert len(store.states) == 2, (
+            'При накоплении пачки изменения должны сбрасываться'
+        )
+
+
+    def test_failed_write_keeps_dirty(self):
+        store = MemoryStateStore(flush_interval=3600)
+        write = store._write
+
+        def broken(states):
+            raise sqlite3.OperationalError('database is locked')
+
+        store._write = broken
+        store.save(Subscription('a', 1, current_date=5))
+        with pytest.raises(sqlite3.OperationalError):
+            store.flush()
+        store._write = write
+        store.flush()
+        assert store.states[Subscription('a', 1).key]['current_date'] == 5, (
+            'Неудачная запись не должна терять изменения'
+        )
+
+
+class TestStatusIndex:
+
+    def test_behaves_like_dict(self):
+        index = StatusIndex({'7': 'approved', 'Спринт 1': 'reviewing'})
+        index['7'] = 'rejected'
+        index['8'] = 'approved'
+        assert index == {'7': 'rejected', 'Спринт 1': 'reviewing',
+                         '8': 'approved'}
+        assert index.get('9') is None and len(index) == 3
+        del index['8']
+        assert StatusIndex(dict(index)) == index, (
+            'Индекс должен переживать сохранение в JSON и обратно'
+        )
+
+    def test_statuses_are_shared_codes(self):
+        first = StatusIndex({'1': 'approved'})
+        second = StatusIndex({'2': ''.join(['appr', 'oved'])})
+        assert first['1'] is second['2'], (
+            'Одинаковые статусы должны храниться одним объектом'
+        )
+        assert STATUSES.count('approved') == 1
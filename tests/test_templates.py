@@ -0,0 +1,28 @@
+from templates import Notification, StatusTemplate, TemplateRegistry
+
+
+class TestTemplates:
+
+    def test_render_structured_notification(self):
+        registry = TemplateRegistry([
+            StatusTemplate('approved', {'ru': 'Ура!', 'en': 'Hooray!'},
+                           'approved'),
+        ])
+        notification = registry.render('approved', 'Спринт {1}')
+        assert notification == \
+            'Изменился статус проверки работы "Спринт {1}". Ура!'
+        assert notification.status == 'approved'
+        assert notification.image == 'approved', (
+            'Картинка должна приходить вместе с уведомлением'
+        )
+        english = registry.render('approved', 'Sprint 1', locale='en')
+        assert english.endswith('Hooray!')
+        assert 'unknown' not in registry
+
+    def test_join_keeps_first_image(self):
+        joined = Notification.join([
+            Notification('a', 'approved', 'approved'),
+            Notification('b', 'rejected', 'rejected'),
+        ])
+        assert joined == 'a\nb'
+        assert joined.image == 'approved'
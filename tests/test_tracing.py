@@ -0,0 +1,131 @@
+import json
+
+import homework
+import tracing
+import utils
+from subscriptions import Subscription
+from templates import Notification
+
+
+class FakeBot:
+
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, chat_id, text):
+        self.messages.append((chat_id, text))
+
+
+class TestTrace:
+
+    def test_spans_follow_events(self):
+        clock = utils.FakeClock(1000.0)
+        trace = tracing.Trace(1, origin=990.0, clock=clock)
+        steps = ((tracing.HTTP_DONE, 0.2), (tracing.PARSE_DONE, 0.1),
+                 (tracing.ENQUEUE, 0.1), (tracing.SEND_MESSAGE, 1))
+        for name, step in steps:
+            clock.now += step
+            trace.mark(name)
+        assert [span[0] for span in trace.spans()] == [
+            tracing.HTTP_DONE, tracing.PARSE_DONE, tracing.ENQUEUE,
+            tracing.SEND_MESSAGE]
+        assert round(trace.pipeline(), 3) == 1.4
+        assert round(trace.end_to_end(), 3) == 11.4, (
+            'Сквозная задержка считается от времени смены статуса в API'
+        )
+
+    def test_retry_marks_stage_again(self):
+        clock = utils.FakeClock(1000.0)
+        trace = tracing.Trace(1, clock=clock)
+        trace.mark(tracing.SEND_MESSAGE)
+        clock.now += 5
+        trace.mark(tracing.SEND_MESSAGE)
+        assert [name for name, _ in trace.events] == [
+            tracing.POLL_START, tracing.SEND_MESSAGE], (
+            'Повторная отправка не должна дублировать этапы трассы'
+        )
+        assert trace.pipeline() == 5
+        assert trace.end_to_end() is None
+
+    def test_parse_api_time(self):
+        assert tracing.parse_time('1970-01-01T00:01:40Z') == 100
+        assert tracing.parse_time('вчера') is None
+        assert tracing.parse_time(None) is None
+
+
+class TestTracer:
+
+    def test_finish_writes_record_and_summary(self, tmp_path):
+        path = tmp_path / 'traces.jsonl'
+        clock = utils.FakeClock(1000.0)
+        tracer = tracing.Tracer(str(path), window=10, clock=clock)
+        for delay in range(1, 5):
+            trace = tracer.start(1)
+            trace.origin = clock.now - 60
+            clock.now += delay
+            trace.mark(tracing.SEND_MESSAGE)
+            tracer.finish(trace)
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert len(records) == 4, 'Каждая доставка должна попасть в файл'
+        assert records[0]['spans'][0]['name'] == tracing.SEND_MESSAGE
+        summary = tracer.summary()
+        assert summary['pipeline'] == {
+            'count': 4, 'p50': 3, 'p95': 4, 'p99': 4}
+        assert summary['end_to_end']['p99'] == 64
+        assert tracing.summarize(tracing.load(str(path)))['pipeline'] == \
+            summary['pipeline'], 'Сводка по файлу должна совпадать с живой'
+
+
+class TestNotificationTrace:
+
+    def test_join_keeps_earliest_change(self):
+        message = Notification.join([
+            Notification('a', updated_at='2022-01-02T00:00:00Z'),
+            Notification('b', updated_at='2022-01-01T00:00:00Z'),
+        ])
+        assert message.updated_at == '2022-01-01T00:00:00Z'
+
+    def test_joined_delivery_finishes_every_trace(self, monkeypatch,
+                                                  tmp_path):
+        tracer = tracing.Tracer(str(tmp_path / 't.jsonl'))
+        monkeypatch.setattr(tracing, 'tracer', tracer)
+        monkeypatch.setattr(homework.ratelimit, 'acquire_telegram',
+                            lambda chat_id: None)
+        notifications = []
+        for text in ('a', 'b'):
+            notification = Notification(text)
+            notification.trace = tracer.start(7)
+            notifications.append(notification)
+        homework.deliver(FakeBot(), 7, Notification.join(notifications))
+        records = (tmp_path / 't.jsonl').read_text().splitlines()
+        assert len(records) == 2, (
+            'Трассы всех объединённых уведомлений должны завершаться'
+        )
+
+    def test_poll_traces_delivery(self, monkeypatch, tmp_path):
+        tracer = tracing.Tracer(str(tmp_path / 't.jsonl'))
+        monkeypatch.setattr(tracing, 'tracer', tracer)
+        monkeypatch.setattr(homework.outbox, 'queue', None)
+        monkeypatch.setattr(homework, 'fetch_changed', lambda subscription: (
+            homework.ApiResponse.from_dict({'homeworks': [{
+                'id': 1, 'status': 'approved', 'lesson_name': 'Спринт 1',
+                'date_updated': '2022-01-01T00:00:00Z'}]})))
+        monkeypatch.setattr(homework.ratelimit, 'acquire_telegram',
+                            lambda chat_id: None)
+        monkeypatch.setattr(homework.settings, 'PHOTO_CAPTIONS', False)
+        bot = FakeBot()
+        monkeypatch.setattr(homework, 'send_photo',
+                            lambda bot, chat_id, name: None)
+        utils.poll_async(bot, [Subscription('token', 7)])
+        assert len(bot.messages) == 1
+        record = json.loads((tmp_path / 't.jsonl').read_text())
+        assert [span['name'] for span in record['spans']] == [
+            tracing.HTTP_DONE, tracing.PARSE_DONE, tracing.ENQUEUE,
+            tracing.SEND_MESSAGE, tracing.SEND_PHOTO], (
+            'В трассе должны быть все этапы доставки'
+        )
+        assert record['chat_id'] == 7
+        assert record['end_to_end'] > record['pipeline'], (
+            'Начало отсчёта - date_updated из ответа API'
+        )
+        assert tracer.summary()['end_to_end']['count'] == 1
@@ -1,6 +1,13 @@
+import asyncio
+import functools
 from inspect import signature
 from types import ModuleType
 
+import homework
+from async_engine import AsyncPollEngine
+from scheduler import PollScheduler
+from storage import MemoryStateStore
+
 
 def check_function(scope: ModuleType, func_name: str, params_qty: int = 0):
     """Checks if scope has a function with specific name and params with qty"""
@@ -37,3 +44,27 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class FakeClock:
+    """Управляемые часы: clock() возвращает now, sleep() сдвигает его."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def poll_async(bot, subscriptions, store=None):
+    """Опрос подписок через poll_subscription_async, как в run().
+    Запросы к API идут по одному, в порядке подписок.
+    """
+    engine = AsyncPollEngine(PollScheduler(interval=600), max_polls=1)
+    for subscription in subscriptions:
+        engine.add(subscription)
+    poll = functools.partial(homework.poll_subscription_async, bot,
+                             store or MemoryStateStore())
+    asyncio.run(engine.run(poll, duration=0.1, drain_timeout=5))
@@ -0,0 +1,214 @@
+"""Задержка уведомлений от смены статуса до доставки в Telegram.
+
+Каждое уведомление несёт Trace с метками времени этапов; после доставки
+трасса пишется строкой JSON в settings.TRACE_FILE.
+Сводка по файлу: python tracing.py [traces.jsonl]
+"""
+import argparse
+import collections
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import metrics
+import settings
+
+logger = logging.getLogger(__name__)
+
+POLL_START = 'poll_start'
+HTTP_DONE = 'http_done'
+PARSE_DONE = 'parse_done'
+ENQUEUE = 'enqueue'
+SEND_MESSAGE = 'send_message'
+SEND_PHOTO = 'send_photo'
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированному списку."""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def parse_time(value):
+    """Время из ответа API (ISO 8601) в секундах Unix или None."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(
+            value.replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class Trace:
+    """Метки времени одного уведомления.
+    origin - время смены статуса по данным API (date_updated).
+    """
+
+    __slots__ = ('trace_id', 'chat_id', 'origin', 'events', 'clock')
+
+    def __init__(self, chat_id, origin=None, clock=time.time):
+        self.trace_id = os.urandom(8).hex()
+        self.chat_id = chat_id
+        self.origin = origin
+        self.clock = clock
+        self.events = [(POLL_START, clock())]
+
+    def mark(self, name):
+        """Отметка о завершении этапа name.
+        При повторной отправке этап и следующие за ним отмечаются заново.
+        """
+        for index, (event, _) in enumerate(self.events):
+            if event == name:
+                del self.events[index:]
+                break
+        self.events.append((name, self.clock()))
+
+    @property
+    def started(self):
+        return self.events[0][1]
+
+    @property
+    def finished(self):
+        return self.events[-1][1]
+
+    def spans(self):
+        """Этапы: (имя, начало, конец); этап начинается с конца прошлого."""
+        return [(name, start, end) for (_, start), (name, end)
+                in zip(self.events, self.events[1:])]
+
+    def end_to_end(self):
+        """От смены статуса в API до доставки или None без origin."""
+        if self.origin is None:
+            return None
+        return self.finished - self.origin
+
+    def pipeline(self):
+        """От начала опроса до доставки."""
+        return self.finished - self.started
+
+    def record(self):
+        """Трасса для файла: этапы как спаны со временем начала и конца."""
+        return {
+            'trace_id': self.trace_id,
+            'chat_id': self.chat_id,
+            'origin': self.origin,
+            'spans': [{'name': name, 'start': round(start, 6),
+                       'end': round(end, 6)}
+                      for name, start, end in self.spans()],
+            'end_to_end': self.end_to_end(),
+            'pipeline': self.pipeline(),
+        }
+
+
+class Tracer:
+    """Запись завершённых трасс и сводка задержек по последним window."""
+
+    def __init__(self, path=None, window=None, clock=time.time):
+        self.path = settings.TRACE_FILE if path is None else path
+        self.window = window or settings.TRACE_WINDOW
+        self.clock = clock
+        self._latencies = {
+            'end_to_end': collections.deque(maxlen=self.window),
+            'pipeline': collections.deque(maxlen=self.window),
+        }
+        self._lock = threading.Lock()
+
+    def start(self, chat_id):
+        """Новая трасса с меткой начала опроса."""
+        return Trace(chat_id, clock=self.clock)
+
+    def finish(self, trace):
+        """Трасса доставленного уведомления: метрики, сводка и файл."""
+        for name, start, end in trace.spans():
+            metrics.TRACE_STAGE_LATENCY.observe(end - start, stage=name)
+        record = trace.record()
+        with self._lock:
+            for name, deque in self._latencies.items():
+                if record[name] is not None:
+                    deque.append(record[name])
+                    metrics.NOTIFICATION_LATENCY.observe(
+                        record[name], span=name)
+            if self.path:
+                try:
+                    with open(self.path, 'a', encoding='utf-8') as file:
+                        file.write(json.dumps(record) + '\n')
+                except OSError as error:
+                    logger.error('Не удалось записать трассу: %s', error)
+        return record
+
+    def summary(self):
+        """Перцентили задержек, секунды: {имя: {'p50': ...}}."""
+        with self._lock:
+            latencies = {name: list(deque)
+                         for name, deque in self._latencies.items()}
+        return summarize(latencies)
+
+
+def summarize(latencies):
+    """Число и перцентили для словаря {имя: список задержек}."""
+    summary = {}
+    for name, values in latencies.items():
+        values = sorted(values)
+        summary[name] = {'count': len(values)}
+        for fraction in PERCENTILES:
+            value = percentile(values, fraction)
+            summary[name][f'p{round(fraction * 100)}'] = (
+                None if value is None else round(value, 3))
+    return summary
+
+
+def summary_text(summary):
+    """Сводка одной строкой для лога."""
+    parts = []
+    for name, values in summary.items():
+        if not values['count']:
+            continue
+        parts.append(f'{name}: p50 {values["p50"]} с, p95 {values["p95"]} с, '
+                     f'p99 {values["p99"]} с (n={values["count"]})')
+    return '; '.join(parts) or 'нет доставленных уведомлений'
+
+
+def load(path):
+    """Задержки из файла трасс: сквозные, конвейера и по этапам."""
+    latencies = collections.defaultdict(list)
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            for name in ('end_to_end', 'pipeline'):
+                if record.get(name) is not None:
+                    latencies[name].append(record[name])
+            for span in record['spans']:
+                latencies[span['name']].append(span['end'] - span['start'])
+    return dict(latencies)
+
+
+tracer = Tracer()
+
+
+def install(new_tracer=None):
+    """Установка трассировщика, через который пройдут все уведомления."""
+    global tracer
+    tracer = new_tracer or Tracer()
+    return tracer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?', default=settings.TRACE_FILE)
+    args = parser.parse_args()
+    summary = summarize(load(args.path))
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
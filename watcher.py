@@ -0,0 +1,59 @@
+import logging
+import os
+import threading
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+
+class FileWatcher:
+    """Фоновая проверка файлов по времени изменения.
+    callback() вызывается из потока наблюдателя, если хотя бы один
+    файл появился, исчез или изменился.
+    """
+
+    def __init__(self, paths, callback, interval=None):
+        self.paths = [path for path in paths if path]
+        self.callback = callback
+        self.interval = interval or settings.RELOAD_CHECK_INTERVAL
+        self._mtimes = self._snapshot()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _snapshot(self):
+        mtimes = {}
+        for path in self.paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def check(self):
+        """Проверка файлов; True, если callback был вызван."""
+        mtimes = self._snapshot()
+        if mtimes == self._mtimes:
+            return False
+        self._mtimes = mtimes
+        self.callback()
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception('Ошибка проверки файлов настроек')
+
+    def start(self):
+        """Запуск потока наблюдателя."""
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='file-watcher')
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Остановка потока наблюдателя не дольше timeout секунд."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)